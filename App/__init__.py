@@ -8,6 +8,7 @@ from flask_migrate import Migrate
 from flask_cors import CORS
 # from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
 from werkzeug.security import generate_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_toastr import Toastr
 from mailersend import emails
 from sqlalchemy import create_engine
@@ -19,12 +20,14 @@ from flask_sitemap import Sitemap
 from flask_ckeditor import CKEditor, upload_fail, upload_success
 from flask_flatpages import FlatPages
 from datetime import timedelta
+from App.replica import RoutingSession, replica_uri
+from App import replica
 
 app = Flask(__name__)
 
 load_dotenv()
 socketio = SocketIO(cors_allowed_origins="*")
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 toastr = Toastr()
 admin = Admin(name='admin')
@@ -61,7 +64,13 @@ else:
     print("Warning: MySQL environment variables are not fully set. Limiter will use in-memory storage.")
     limiter = Limiter(key_func=get_remote_address)
 
+# Jumlah reverse proxy di depan gunicorn; tanpa ini remote_addr selalu alamat proxy
+PROXY_COUNT = int(os.environ.get('PROXY_COUNT', 1))
+
 def create_app():
+    if PROXY_COUNT and not isinstance(app.wsgi_app, ProxyFix):
+        # Batas per-IP (limiter dan admission asisten) membaca IP klien asli dari X-Forwarded-For
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_COUNT)
     app.config['SECRET_KEY'] = os.environ.get("SECRET_KEY", 'rindang_digifarm') # Gunakan variabel environment atau nilai default
     app.config['SQLALCHEMY_DATABASE_URI'] = mysql_uri
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -72,6 +81,9 @@ def create_app():
         "pool_timeout": 20,
         "max_overflow": 5
     }
+    # Replica baca opsional; tanpa MYSQL_REPLICA_HOST semua kueri tetap ke primary
+    if replica_uri(mysql_port):
+        app.config['SQLALCHEMY_BINDS'] = {replica.REPLICA_BIND: replica_uri(mysql_port)}
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Batasi ukuran file (misal: 16MB)
     app.config['SESSION_COOKIE_SECURE'] = True  # Untuk HTTPS
     app.config['SESSION_COOKIE_HTTPONLY'] = True
@@ -101,6 +113,7 @@ def create_app():
     app.config['MAIL_ASCII_ATTACHMENTS'] = False
 
     db.init_app(app)
+    replica.init_app(app)
     socketio.init_app(app)
     login_manager.init_app(app)
     toastr.init_app(app)
@@ -117,6 +130,26 @@ def create_app():
     app.register_blueprint(views, url_prefix='/')
     app.register_blueprint(admin_page, url_prefix='/')
 
+    from .prices import harga_cli
+    from .regions import wilayah_cli, region_name
+    from .weather import cuaca_cli
+    from .rollup import produksi_cli
+    from .queryplan import kueri_cli
+    from .archive import arsip_cli
+    from .jobs import jobs_cli
+
+    app.cli.add_command(harga_cli)
+    app.cli.add_command(wilayah_cli)
+    app.cli.add_command(cuaca_cli)
+    app.cli.add_command(produksi_cli)
+    app.cli.add_command(kueri_cli)
+    app.cli.add_command(arsip_cli)
+    app.cli.add_command(jobs_cli)
+    app.add_template_filter(region_name, 'nama_wilayah')
+
+    from . import reports
+    reports.init_app(app)
+
     login_manager.login_view = 'auth.login'
 
     @app.route('/uploads/<path:filename>')
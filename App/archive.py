@@ -0,0 +1,158 @@
+import os, click
+
+from datetime import date, datetime
+from flask.cli import AppGroup
+from sqlalchemy import event, select, insert, delete, literal
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from App import db
+from App.models import DataPangan, Forum, arsip_data_pangan, arsip_forum
+
+arsip_cli = AppGroup('arsip', help='Pindahkan data terhapus dan musim lama ke tabel arsip.')
+
+ARCHIVE_BATCH = int(os.environ.get('ARCHIVE_BATCH', 500))
+# 0 = data pangan yang sudah dipanen tidak pernah diarsipkan berdasarkan umur
+ARCHIVE_SEASON_YEARS = int(os.environ.get('ARCHIVE_SEASON_YEARS', 0))
+
+ARCHIVES = {DataPangan: arsip_data_pangan, Forum: arsip_forum}
+OWNER_COLUMNS = {DataPangan: 'user_id', Forum: 'created_by'}
+# Nama jenis data di URL halaman sampah
+TRASH_KINDS = {'data-pangan': DataPangan, 'forum': Forum}
+
+REASON_DELETED = 'dihapus'
+REASON_OLD_SEASON = 'musim_lama'
+
+@event.listens_for(Session, 'do_orm_execute')
+def _hide_deleted(orm_execute_state):
+    """Filters soft-deleted rows of the archived models out of every SELECT.
+
+    Pass execution_options(include_deleted=True) to see them.
+    """
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_column_load
+        and not orm_execute_state.is_relationship_load
+        and not orm_execute_state.execution_options.get('include_deleted', False)
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            with_loader_criteria(DataPangan, lambda cls: cls.is_deleted.isnot(True), include_aliases=True),
+            with_loader_criteria(Forum, lambda cls: cls.is_deleted.isnot(True), include_aliases=True),
+        )
+
+def _move(model, where, reason, batch):
+    """Moves rows of model matching where into its archive table, one batch per transaction."""
+    table = model.__table__
+    archive = ARCHIVES[model]
+    names = [column.name for column in table.columns]
+    moved = 0
+    while True:
+        ids = db.session.execute(
+            select(table.c.id).where(where).order_by(table.c.id).limit(batch),
+            execution_options={'include_deleted': True},
+        ).scalars().all()
+        if not ids:
+            return moved
+        rows = select(*table.columns, literal(datetime.now(), db.DateTime), literal(reason, db.String)).where(table.c.id.in_(ids))
+        db.session.execute(insert(archive).from_select(names + ['archived_at', 'alasan'], rows))
+        # Lewat session agar rollup produksi dan cache ikut diperbarui
+        db.session.execute(delete(table).where(table.c.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+
+def archive_deleted(batch=ARCHIVE_BATCH):
+    """Moves every soft-deleted row to the archive tables.
+
+    Returns:
+        dict: Rows moved per table.
+    """
+    return {
+        model.__table__.name: _move(model, model.__table__.c.is_deleted.is_(True), REASON_DELETED, batch)
+        for model in ARCHIVES
+    }
+
+def archive_old_seasons(years, batch=ARCHIVE_BATCH):
+    """Moves harvested DataPangan rows from calendar years more than `years` ago.
+
+    Their production also leaves the produksi_harian rollup.
+
+    Returns:
+        int: Rows moved.
+    """
+    cutoff = date(date.today().year - years, 1, 1)
+    table = DataPangan.__table__
+    return _move(DataPangan, table.c.tanggal_panen < cutoff, REASON_OLD_SEASON, batch)
+
+def _as_json(values):
+    return {key: value.isoformat() if isinstance(value, (date, datetime)) else value for key, value in values.items()}
+
+def trash(model, owner_id, limit=100):
+    """Lists the deleted rows of owner_id, newest first, both not yet archived and archived.
+
+    Returns:
+        list[dict]: Row values plus `diarsipkan` (bool).
+    """
+    owner = OWNER_COLUMNS[model]
+    archive = ARCHIVES[model]
+    pending = (
+        model.query.execution_options(include_deleted=True)
+        .filter(model.is_deleted.is_(True), getattr(model, owner) == owner_id)
+        .order_by(model.id.desc())
+        .limit(limit)
+        .all()
+    )
+    archived = db.session.execute(
+        select(archive)
+        .where(archive.c[owner] == owner_id, archive.c.alasan == REASON_DELETED)
+        .order_by(archive.c.archived_at.desc())
+        .limit(limit)
+    ).mappings().all()
+
+    items = [
+        _as_json({**{column.name: getattr(row, column.key) for column in model.__mapper__.column_attrs}, 'diarsipkan': False})
+        for row in pending
+    ]
+    items += [_as_json({**row, 'diarsipkan': True}) for row in archived]
+    return items[:limit]
+
+def restore(model, id, owner_id=None):
+    """Brings a deleted row back into the live table.
+
+    Args:
+        model: DataPangan or Forum.
+        id (int): Row id.
+        owner_id (int): Only restore rows owned by this user; None for any row.
+
+    Returns:
+        bool: False if no deleted row with that id (and owner) exists.
+    """
+    owner = OWNER_COLUMNS[model]
+    obj = db.session.get(model, id, execution_options={'include_deleted': True})
+    if obj is not None:
+        if not obj.is_deleted or (owner_id is not None and getattr(obj, owner) != owner_id):
+            return False
+        obj.is_deleted = False
+        db.session.commit()
+        return True
+
+    archive = ARCHIVES[model]
+    row = db.session.execute(select(archive).where(archive.c.id == id)).mappings().first()
+    if row is None or (owner_id is not None and row[owner] != owner_id):
+        return False
+    values = {column.name: row[column.name] for column in model.__table__.columns}
+    values['is_deleted'] = False
+    # Disisipkan sebagai daftar parameter agar rollup produksi tahu kunci yang berubah
+    db.session.execute(insert(model), [values])
+    db.session.execute(delete(archive).where(archive.c.id == id))
+    db.session.commit()
+    return True
+
+@arsip_cli.command('jalankan')
+@click.option('--musim-tahun', type=int, default=ARCHIVE_SEASON_YEARS, show_default=True,
+              help='Arsipkan juga data pangan yang dipanen lebih dari N tahun kalender lalu (0 = tidak).')
+@click.option('--batch', type=int, default=ARCHIVE_BATCH, show_default=True, help='Baris per transaksi.')
+def run_command(musim_tahun, batch):
+    """Pindahkan data terhapus (dan musim lama) ke tabel arsip."""
+    for table, moved in archive_deleted(batch).items():
+        click.echo(f"{moved} baris terhapus dari {table} diarsipkan.")
+    if musim_tahun > 0:
+        click.echo(f"{archive_old_seasons(musim_tahun, batch)} baris musim lama dari data_pangan diarsipkan.")
@@ -0,0 +1,23 @@
+import math
+
+from bs4 import BeautifulSoup
+from textwrap import shorten
+
+EXCERPT_LENGTH = 280
+WORDS_PER_MINUTE = 200
+
+def plain_text(html):
+    """Returns the visible text of an article body, whitespace collapsed."""
+    if not html:
+        return ''
+    return ' '.join(BeautifulSoup(html, 'html.parser').get_text(' ').split())
+
+def summarize(html):
+    """Returns (ringkasan, waktu_baca) for an article body.
+
+    ringkasan is a plain-text excerpt of at most EXCERPT_LENGTH characters
+    and waktu_baca the reading time in whole minutes (at least 1).
+    """
+    text = plain_text(html)
+    minutes = max(1, math.ceil(len(text.split()) / WORDS_PER_MINUTE))
+    return shorten(text, width=EXCERPT_LENGTH, placeholder='…'), minutes
@@ -0,0 +1,157 @@
+import hashlib, logging, os, re, threading, markdown2, google.generativeai as genai
+
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+
+from App import db
+from App.cache import TTLCache
+from App.gateway import gateway
+from App.models import JawabanAsisten
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = "gemini-1.5-flash"
+GEMINI_HOST = 'generativelanguage.googleapis.com'
+GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', 30))
+ASSISTANT_CACHE_TTL = int(os.environ.get('ASSISTANT_CACHE_TTL', 7 * 24 * 3600))
+ASSISTANT_CACHE_SIZE = int(os.environ.get('ASSISTANT_CACHE_SIZE', 1000))
+
+PROMPT_TEMPLATE = "Saya adalah asisten virtual untuk platform agrikultur digital bernama RINDANG, yang membantu petani mengelola produksi pertanian dan memberikan informasi seputar pertanian di Kota Ternate. Saya hanya boleh memberikan jawaban terkait agrikultur, termasuk tetapi tidak terbatas pada: cara merawat tanaman, rekomendasi pupuk, langkah-langkah menghadapi cuaca, dan teknologi pertanian. Pertanyaan pengguna: {message}."
+
+# Lapis pertama di memori; lapis kedua tabel jawaban_asisten agar tetap ada setelah restart
+reply_cache = TTLCache(ttl=ASSISTANT_CACHE_TTL, maxsize=ASSISTANT_CACHE_SIZE, name='asisten')
+
+class AssistantError(Exception):
+    """Raised when Gemini returns no usable content."""
+
+class _Counters:
+    def __init__(self):
+        self.db_hits = 0
+        self.model_calls = 0
+        self._lock = threading.Lock()
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+counters = _Counters()
+
+def normalize_message(message):
+    """Lowercases, strips punctuation and collapses whitespace so trivial variants share a key."""
+    text = re.sub(r'[^\w\s]', ' ', message.lower())
+    return ' '.join(text.split())
+
+def cache_key(message):
+    return hashlib.sha1(normalize_message(message).encode('utf-8')).hexdigest()
+
+def build_prompt(message):
+    return PROMPT_TEMPLATE.format(message=message)
+
+def render_reply(text):
+    # Convert Markdown to HTML in the backend using markdown2
+    return markdown2.markdown(text)
+
+def _load_stored(key):
+    cutoff = datetime.now() - timedelta(seconds=ASSISTANT_CACHE_TTL)
+    stored = JawabanAsisten.query.filter(JawabanAsisten.kunci == key, JawabanAsisten.created_at >= cutoff).first()
+    if stored is None:
+        return None
+    JawabanAsisten.query.filter_by(id=stored.id).update({'hits': JawabanAsisten.hits + 1}, synchronize_session=False)
+    db.session.commit()
+    return stored.balasan
+
+def store_reply(message, reply):
+    """Persists a rendered reply and drops expired ones."""
+    key = cache_key(message)
+    cutoff = datetime.now() - timedelta(seconds=ASSISTANT_CACHE_TTL)
+    try:
+        JawabanAsisten.query.filter(JawabanAsisten.created_at < cutoff).delete(synchronize_session=False)
+        JawabanAsisten.query.filter_by(kunci=key).delete(synchronize_session=False)
+        db.session.add(JawabanAsisten(kunci=key, pertanyaan=normalize_message(message), balasan=reply))
+        db.session.commit()
+    except IntegrityError:
+        # Pertanyaan yang sama baru saja disimpan oleh worker lain
+        db.session.rollback()
+    reply_cache.set(key, reply)
+
+def cached_reply(message):
+    """Returns the stored HTML reply for message, or None."""
+    key = cache_key(message)
+    reply = reply_cache.get(key)
+    if reply is None:
+        reply = _load_stored(key)
+        if reply is not None:
+            counters.incr('db_hits')
+            reply_cache.set(key, reply)
+    return reply
+
+def _generate(message):
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    counters.incr('model_calls')
+    response = gateway.call(GEMINI_HOST, model.generate_content, build_prompt(message),
+                            request_options={'timeout': GEMINI_TIMEOUT})
+    if not (response and response.text):
+        raise AssistantError('No content received from Gemini API')
+    return render_reply(response.text)
+
+def ask(message):
+    """Answers a farmer's question as rendered HTML, reusing earlier answers.
+
+    Lookups go memory LRU -> jawaban_asisten table -> Gemini. Identical
+    questions asked concurrently share one model call.
+
+    Raises:
+        AssistantError: If Gemini returns no content.
+        Exception: Any error raised by the Gemini client.
+    """
+    key = cache_key(message)
+
+    def load():
+        reply = _load_stored(key)
+        if reply is not None:
+            counters.incr('db_hits')
+            return reply
+        reply = _generate(message)
+        store_reply(message, reply)
+        return reply
+
+    return reply_cache.get_or_load(key, load)
+
+def stream(message):
+    """Yields (event, html) pairs while Gemini generates the answer.
+
+    Each "chunk" event carries the whole reply so far rendered as HTML, so
+    clients can replace the bubble content and get correctly closed markup
+    at every step. The last event is "done" with the final HTML, which is
+    then cached like replies from ask().
+
+    Raises:
+        AssistantError: If Gemini returns no content.
+        Exception: Any error raised by the Gemini client.
+    """
+    reply = cached_reply(message)
+    if reply is not None:
+        yield 'done', reply
+        return
+
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    counters.incr('model_calls')
+    text = ''
+    with gateway.track(GEMINI_HOST):
+        response = model.generate_content(build_prompt(message), stream=True,
+                                          request_options={'timeout': GEMINI_TIMEOUT})
+        for chunk in response:
+            if chunk.text:
+                text += chunk.text
+                yield 'chunk', render_reply(text)
+
+    if not text:
+        raise AssistantError('No content received from Gemini API')
+    reply = render_reply(text)
+    store_reply(message, reply)
+    yield 'done', reply
+
+def stats():
+    data = reply_cache.stats()
+    data.update(db_hits=counters.db_hits, model_calls=counters.model_calls)
+    return data
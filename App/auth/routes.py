@@ -6,6 +6,7 @@ from flask_mail import Message
 from datetime import datetime, timedelta
 from App.utils import confirm_token, generate_confirmation_token, send_password_reset_email
 from App.models import User, Personal, Ahli, Petani
+from App.identity import load_user as cached_user
 from App import app, db, login_manager, mail, limiter
 
 import logging, string, random, smtplib, os, tempfile, json
@@ -39,7 +40,7 @@ def unauthorized(error):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return cached_user(int(user_id))
 
 def general_unique_id(prefix="RU_", string_length=2, number_length=4):
     """
@@ -0,0 +1,86 @@
+import colorsys, hashlib, io, os, tempfile
+
+from functools import lru_cache
+from flask import current_app
+from PIL import Image, ImageDraw, ImageFont
+
+from App import db
+from App.cache import TTLCache
+from App.models import User
+
+AVATAR_SIZES = (32, 64, 128, 256)
+DEFAULT_AVATAR_SIZE = 64
+AVATAR_MAX_AGE = 365 * 24 * 3600
+# Nama yang bukan pengguna bisa menjadi pengguna kemudian, jadi hanya di-cache sebentar
+GUEST_AVATAR_MAX_AGE = int(os.environ.get('GUEST_AVATAR_MAX_AGE', 10 * 60))
+
+# Hasil pencarian nama pengguna; nama pengguna sudah punya file sehingga praktis hanya
+# nama asing yang tersimpan di sini, tidak perlu kueri ulang untuk setiap request-nya
+user_name_cache = TTLCache(ttl=GUEST_AVATAR_MAX_AGE, maxsize=4096, name='avatar')
+
+def normalize_size(size):
+    """Snaps a requested size to the nearest pre-rendered size."""
+    if not size:
+        return DEFAULT_AVATAR_SIZE
+    return min(AVATAR_SIZES, key=lambda s: abs(s - size))
+
+@lru_cache(maxsize=len(AVATAR_SIZES))
+def _font(size):
+    font_path = os.path.join(current_app.root_path, 'static', 'fonts', 'plusjakarta', 'PlusJakartaSans-Bold.ttf')
+    return ImageFont.truetype(font_path, int(size * 0.5))
+
+def _background(digest):
+    # Warna tetap per nama, cukup gelap agar huruf putih terbaca
+    hue = int(digest[:4], 16) / 0xFFFF
+    r, g, b = colorsys.hls_to_rgb(hue, 0.45, 0.55)
+    return int(r * 255), int(g * 255), int(b * 255), 255
+
+def render_avatar(name, size):
+    """Draws a round avatar with the first letter of name on a colour derived from it."""
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    initial = next((ch for ch in name.strip() if ch.isalnum()), '?').upper()
+
+    # Digambar 2x lalu diperkecil agar tepi lingkaran halus
+    scale = 2
+    image = Image.new('RGBA', (size * scale, size * scale), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((0, 0, size * scale - 1, size * scale - 1), fill=_background(digest))
+    draw.text((size * scale / 2, size * scale / 2), initial, font=_font(size * scale), fill='white', anchor='mm')
+    return image.resize((size, size), Image.LANCZOS)
+
+def _lookup_user_name(name):
+    # Template forum memakai id pengguna sebagai nama avatar
+    matches = db.or_(User.nama_lengkap == name, User.username == name)
+    if name.isdigit():
+        matches = db.or_(matches, User.id == int(name))
+    return db.session.query(User.id).filter(User.is_deleted == False, matches).first() is not None
+
+def _is_user_name(name):
+    return user_name_cache.get_or_load(name, lambda: _lookup_user_name(name))
+
+def avatar_file(name, size):
+    """Returns (file, is_user) with the PNG for (name, size).
+
+    Avatars of existing users are rendered once and kept in
+    <instance>/avatars, keyed by a hash of the name, so the same URL always
+    maps to the same bytes and can be cached forever. Any other name is
+    rendered in memory only, so arbitrary URLs cannot fill the disk, and
+    is_user is False so the caller caches it only briefly.
+    """
+    cache_dir = os.path.join(current_app.instance_path, 'avatars')
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    path = os.path.join(cache_dir, f'{digest}_{size}.png')
+    if os.path.exists(path):
+        return path, True
+    if not _is_user_name(name):
+        buffer = io.BytesIO()
+        render_avatar(name, size).save(buffer, format='PNG', optimize=True)
+        buffer.seek(0)
+        return buffer, False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # Tulis ke file sementara lalu rename supaya request paralel tidak membaca file setengah jadi
+    with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.png', delete=False) as tmp:
+        render_avatar(name, size).save(tmp, format='PNG', optimize=True)
+    os.replace(tmp.name, path)
+    return path, True
@@ -0,0 +1,249 @@
+import logging, threading, time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+class _Entry:
+    __slots__ = ('value', 'fresh_until', 'stale_until')
+
+    def __init__(self, value, fresh_until, stale_until):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+class _Flight:
+    """A load in progress that other callers for the same key wait on."""
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+def spawn(func, *args, **kwargs):
+    """Runs func in the background, inside the current app context if there is one.
+
+    Under the eventlet worker `threading` is monkey-patched, so this starts a
+    greenthread rather than an OS thread.
+    """
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def run():
+        try:
+            if app is not None:
+                with app.app_context():
+                    func(*args, **kwargs)
+            else:
+                func(*args, **kwargs)
+        except Exception:
+            logger.exception("Background task %r failed", getattr(func, '__name__', func))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+class TTLCache:
+    """Thread-safe LRU cache with TTL, stale-while-revalidate and single-flight loading.
+
+    Args:
+        ttl: Seconds an entry stays fresh.
+        stale_ttl: Extra seconds an expired entry may still be served while a
+            single background refresh runs.
+        maxsize: Maximum number of entries; the least recently used is evicted.
+        name: Label used in logs and in stats().
+    """
+
+    def __init__(self, ttl, stale_ttl=0, maxsize=256, name='cache'):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.name = name
+        self._data = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Returns the cached value if it is still fresh, otherwise default."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or time.monotonic() >= entry.fresh_until:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = _Entry(value, now + ttl, now + ttl + self.stale_ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Returns the value for key, calling loader() at most once per key at a time.
+
+        Fresh entries are returned directly. Stale entries (within stale_ttl)
+        are returned immediately while one background refresh is started.
+        On a miss the first caller runs the loader and concurrent callers
+        for the same key wait for its result instead of loading again.
+
+        Args:
+            key: Hashable cache key.
+            loader: Zero-argument callable producing the value. Exceptions are
+                propagated to every caller waiting on this load and nothing is cached.
+            ttl: Optional per-call override of the fresh lifetime.
+
+        Returns:
+            The cached or freshly loaded value.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and now < entry.fresh_until:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry.value
+
+            if entry is not None and now < entry.stale_until:
+                self._data.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._flights:
+                    self._flights[key] = _Flight()
+                    spawn(self._refresh, key, loader, ttl)
+                return entry.value
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        return self._run(key, flight, loader, ttl)
+
+    def _run(self, key, flight, loader, ttl):
+        try:
+            value = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            flight.value = value
+            self.set(key, value, ttl)
+            return value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _refresh(self, key, loader, ttl):
+        with self._lock:
+            flight = self._flights.get(key)
+        try:
+            self._run(key, flight, loader, ttl)
+        except Exception as e:
+            # Entry lama tetap dipakai sampai masa stale habis
+            logger.warning("Refresh of %s[%r] failed: %s", self.name, key, e)
+
+    def _hit_rate(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return round((self.hits + self.stale_hits) / lookups, 3) if lookups else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'size': len(self._data),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_rate': self._hit_rate(),
+                'inflight': len(self._flights),
+            }
+
+_watchers = []
+
+def on_commit(models, callback):
+    """Calls callback(changes) after every commit that wrote to one of models.
+
+    Args:
+        models: Model classes to watch.
+        callback: Receives a list of (model, values) pairs, one per row added,
+            changed or deleted in the transaction. values holds the row's
+            loaded attributes as of the flush, since instances are expired
+            by the time the commit finishes. Bulk insert/update/delete
+            statements contribute (model, None) because the affected rows
+            are unknown.
+    """
+    _watchers.append(({model.__table__ for model in models}, callback))
+
+def _changes(session):
+    return session.info.setdefault('cache_changes', [])
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed(session, flush_context):
+    if _watchers:
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            values = {key: value for key, value in inspect(obj).dict.items() if not key.startswith('_')}
+            _changes(session).append((type(obj), values))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk(orm_execute_state):
+    if not _watchers or not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        _changes(orm_execute_state.session).append((mapper.class_, None))
+        return
+    # insert(Model.__table__) dan sejenisnya tidak membawa mapper
+    table = getattr(orm_execute_state.statement, 'table', None)
+    for mapper in _mappers():
+        if mapper.local_table is table:
+            _changes(orm_execute_state.session).append((mapper.class_, None))
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch(session):
+    changes = session.info.pop('cache_changes', None)
+    if not changes:
+        return
+    for tables, callback in _watchers:
+        matched = [(model, values) for model, values in changes if getattr(model, '__table__', None) in tables]
+        if matched:
+            try:
+                callback(matched)
+            except Exception:
+                logger.exception("Cache invalidation %r failed", getattr(callback, '__name__', callback))
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop('cache_changes', None)
+
+def _mappers():
+    from App import db
+    return db.Model.registry.mappers
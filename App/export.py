@@ -0,0 +1,145 @@
+import csv, io, os, tempfile
+
+from datetime import date
+from flask import Response, request, stream_with_context
+from openpyxl import Workbook
+from sqlalchemy import select
+
+from App import db
+from App.models import DataPangan, Kebun, User
+
+EXPORT_BATCH = int(os.environ.get('EXPORT_BATCH', 1000))
+FILE_CHUNK = 64 * 1024
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+def _production(filters):
+    tanggal = db.func.coalesce(DataPangan.tanggal_panen, DataPangan.tanggal_bibit)
+    statement = (
+        select(DataPangan.id, Kebun.nama, DataPangan.komoditas, DataPangan.jml_bibit, DataPangan.tanggal_bibit,
+               DataPangan.status, DataPangan.jml_panen, DataPangan.tanggal_panen, DataPangan.estimasi_panen,
+               DataPangan.user_id, User.nama_lengkap)
+        .outerjoin(Kebun, Kebun.id == DataPangan.kebun_id)
+        .outerjoin(User, User.id == DataPangan.user_id)
+        .order_by(DataPangan.id)
+    )
+    if filters.get('user_id') is not None:
+        statement = statement.where(DataPangan.user_id == filters['user_id'])
+    if filters.get('kebun_id') is not None:
+        statement = statement.where(DataPangan.kebun_id == filters['kebun_id'])
+    if filters.get('komoditas'):
+        statement = statement.where(DataPangan.komoditas == filters['komoditas'])
+    # Rentang tanggal sama dengan grafik produksi: tanggal panen, atau tanggal bibit jika belum panen
+    if filters.get('start') is not None:
+        statement = statement.where(tanggal >= filters['start'])
+    if filters.get('end') is not None:
+        statement = statement.where(tanggal <= filters['end'])
+    headers = ['ID', 'Kebun', 'Komoditas', 'Jumlah Bibit', 'Tanggal Bibit', 'Status', 'Jumlah Panen',
+               'Tanggal Panen', 'Estimasi Panen', 'ID Petani', 'Nama Petani']
+    return headers, statement
+
+def _gardens(filters):
+    statement = (
+        select(Kebun.id, Kebun.unique_id, Kebun.nama, Kebun.luas_kebun, Kebun.koordinat, Kebun.user_id, User.nama_lengkap)
+        .outerjoin(User, User.id == Kebun.user_id)
+        .where(Kebun.is_deleted == False)
+        .order_by(Kebun.id)
+    )
+    if filters.get('user_id') is not None:
+        statement = statement.where(Kebun.user_id == filters['user_id'])
+    if filters.get('kebun_id') is not None:
+        statement = statement.where(Kebun.id == filters['kebun_id'])
+    headers = ['ID', 'Kode', 'Nama', 'Luas (ha)', 'Koordinat (lng, lat)', 'ID Pemilik', 'Nama Pemilik']
+    return headers, statement
+
+def _users(filters):
+    statement = (
+        select(User.id, User.username, User.email, User.role, User.nama_lengkap, User.kelurahan, User.kec,
+               User.kota, User.is_verified, User.created_at)
+        .where(User.is_deleted == False)
+        .order_by(User.id)
+    )
+    if filters.get('user_id') is not None:
+        statement = statement.where(User.id == filters['user_id'])
+    headers = ['ID', 'Username', 'Email', 'Peran', 'Nama Lengkap', 'Kelurahan', 'Kecamatan', 'Kota',
+               'Terverifikasi', 'Terdaftar']
+    return headers, statement
+
+DATASETS = {'data-pangan': _production, 'kebun': _gardens, 'pengguna': _users}
+
+def request_filters(user_id=None):
+    """Reads the dashboard filters from the query string; user_id, if given, overrides ?user_id=."""
+    return {
+        'user_id': user_id if user_id is not None else request.args.get('user_id', type=int),
+        'kebun_id': request.args.get('kebun_id', type=int),
+        'komoditas': request.args.get('komoditas') or None,
+        'start': request.args.get('start', type=date.fromisoformat),
+        'end': request.args.get('end', type=date.fromisoformat),
+    }
+
+def _rows(statement):
+    # yield_per membuat driver memakai server-side cursor dan mengambil baris per batch
+    return db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH))
+
+def _csv(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')  # BOM agar Excel membaca UTF-8
+    writer.writerow(headers)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def _xlsx(headers, rows, title):
+    # Mode write-only menulis baris ke file sementara; zip xlsx baru bisa dikirim setelah selesai disusun
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet(title=title[:31])
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(list(row))
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        for chunk in iter(lambda: tmp.read(FILE_CHUNK), b''):
+            yield chunk
+
+def export_response(dataset, fmt, filters):
+    """Streams a dataset as a CSV or XLSX download.
+
+    Rows are read through a server-side cursor in batches of EXPORT_BATCH,
+    so memory stays constant. CSV bytes are sent as soon as the first batch
+    is read; XLSX is assembled in a temporary file and then streamed.
+
+    Args:
+        dataset (str): "data-pangan", "kebun" or "pengguna".
+        fmt (str): "csv" or "xlsx".
+        filters (dict): user_id, kebun_id, komoditas, start, end; None
+            values are ignored.
+
+    Returns:
+        Response, or None if dataset or fmt is unknown.
+    """
+    if dataset not in DATASETS or fmt not in FORMATS:
+        return None
+    headers, statement = DATASETS[dataset](filters)
+
+    def generate():
+        rows = _rows(statement)
+        if fmt == 'csv':
+            yield from _csv(headers, rows)
+        else:
+            yield from _xlsx(headers, rows, dataset)
+
+    filename = f'{dataset}-{date.today().isoformat()}.{fmt}'
+    return Response(stream_with_context(generate()), content_type=FORMATS[fmt], headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        # Nginx/proxy tidak menahan respons sampai selesai
+        'X-Accel-Buffering': 'no',
+    })
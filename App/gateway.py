@@ -0,0 +1,206 @@
+import logging, os, threading, time, requests
+
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 2))
+BREAKER_FAILURES = int(os.environ.get('BREAKER_FAILURES', 5))
+BREAKER_RESET = float(os.environ.get('BREAKER_RESET', 30))
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without contacting the host while its circuit breaker is open."""
+
+class CircuitBreaker:
+    """Counts consecutive failures for one host and fails fast once it looks down.
+
+    After `failures` consecutive failures the breaker opens for `reset_timeout`
+    seconds. The first call after that is let through as a probe: success
+    closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, host, failures=BREAKER_FAILURES, reset_timeout=BREAKER_RESET):
+        self.host = host
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self._probing):
+                retry_in = max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+                raise CircuitOpenError(f"{self.host} sedang tidak tersedia, coba lagi dalam {retry_in:.0f} detik")
+            if state == 'half-open':
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probing = False
+            if self.opened_at is not None or self.consecutive_failures >= self.failures:
+                if self.opened_at is None:
+                    logger.warning("Circuit breaker untuk %s terbuka setelah %d kegagalan", self.host, self.consecutive_failures)
+                self.opened_at = time.monotonic()
+
+class HostStats:
+    __slots__ = ('requests', 'errors', 'total_ms', 'max_ms', 'last_ms')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def record(self, elapsed_ms, ok):
+        self.requests += 1
+        self.errors += 0 if ok else 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.last_ms = elapsed_ms
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / self.requests, 1) if self.requests else 0,
+            'max_ms': round(self.max_ms, 1),
+            'last_ms': round(self.last_ms, 1),
+        }
+
+class HttpGateway:
+    """Outbound HTTP client shared by everything that calls third-party hosts.
+
+    Each host gets its own keep-alive session with a bounded connection pool,
+    default connect/read timeouts, retries with jittered backoff for idempotent
+    requests, a circuit breaker and latency counters.
+    """
+
+    def __init__(self, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), retries=HTTP_RETRIES):
+        self.timeout = timeout
+        self.retries = retries
+        self._sessions = {}
+        self._breakers = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _session(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                retry = Retry(
+                    total=self.retries,
+                    backoff_factor=0.3,
+                    backoff_jitter=0.3,
+                    status_forcelist=(429, 502, 503, 504),
+                    allowed_methods=frozenset({'GET', 'HEAD'}),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=retry)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[host] = session
+                self._breakers[host] = CircuitBreaker(host)
+                self._stats[host] = HostStats()
+            return session
+
+    def breaker(self, host):
+        self._session(host)
+        return self._breakers[host]
+
+    @contextmanager
+    def track(self, host):
+        """Wraps a block talking to host in its breaker and latency counters.
+
+        Used for clients that do not go through requests (e.g. the Gemini SDK),
+        including streamed responses consumed inside the block.
+        """
+        breaker = self.breaker(host)
+        breaker.before_call()
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        except GeneratorExit:
+            # Klien memutus stream; bukan kegagalan host
+            ok = True
+            raise
+        finally:
+            self._stats[host].record((time.perf_counter() - started) * 1000, ok)
+            if ok:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+    def call(self, host, func, *args, **kwargs):
+        """Runs func through the breaker and latency counters of host."""
+        with self.track(host):
+            return func(*args, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """Sends a request through the host's pooled session.
+
+        Returns:
+            requests.Response: The response; 5xx responses count as failures
+            for the circuit breaker but are returned to the caller as usual.
+
+        Raises:
+            CircuitOpenError: If the host's circuit breaker is open.
+            requests.exceptions.RequestException: On connection errors or timeouts.
+        """
+        host = urlsplit(url).hostname
+        session = self._session(host)
+        breaker = self._breakers[host]
+        breaker.before_call()
+        kwargs.setdefault('timeout', self.timeout)
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = session.request(method, url, **kwargs)
+            ok = response.status_code < 500
+            return response
+        finally:
+            self._stats[host].record((time.perf_counter() - started) * 1000, ok)
+            if ok:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            hosts = list(self._sessions)
+        return {
+            host: dict(self._stats[host].as_dict(), circuit=self._breakers[host].state)
+            for host in hosts
+        }
+
+gateway = HttpGateway()
@@ -0,0 +1,79 @@
+import copy, os, threading
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from App import db
+from App.cache import TTLCache, on_commit
+from App.models import User
+
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 4096))
+
+# Menyimpan (versi, nilai kolom) per user_id, bukan instance, agar aman dipakai bersama antar greenthread
+user_cache = TTLCache(ttl=USER_CACHE_TTL, maxsize=USER_CACHE_SIZE, name='pengguna')
+
+_versions = {}
+_generation = 0
+_versions_lock = threading.Lock()
+
+def _version(user_id):
+    with _versions_lock:
+        return _generation, _versions.get(user_id, 0)
+
+def invalidate_user(user_id):
+    """Drops the cached row of user_id and bumps its version.
+
+    A load that started before the bump will not write its (possibly
+    stale) result back into the cache.
+    """
+    with _versions_lock:
+        _versions[user_id] = _versions.get(user_id, 0) + 1
+    user_cache.delete(user_id)
+
+def _snapshot(user):
+    return {attr.key: getattr(user, attr.key) for attr in inspect(user).mapper.column_attrs}
+
+def _attach(values):
+    # Kelas turunan (Petani, Ahli, ...) dipilih dari kolom role seperti saat query biasa
+    mapper = inspect(User).polymorphic_map.get(values.get('role'), inspect(User))
+    user = mapper.class_manager.new_instance()
+    for key, value in copy.deepcopy(values).items():
+        set_committed_value(user, key, value)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+def load_user(user_id):
+    """Returns the User for user_id, from the identity cache when possible.
+
+    The cached column values are merged into the current session with
+    load=False, so no SELECT is issued and relationships still lazy-load
+    normally. Entries expire after USER_CACHE_TTL seconds and are dropped
+    after any commit that writes the users row.
+    """
+    version = _version(user_id)
+    cached = user_cache.get(user_id)
+    if cached is not None and cached[0] == version:
+        return _attach(cached[1])
+
+    user = db.session.get(User, user_id)
+    if user is not None and _version(user_id) == version:
+        user_cache.set(user_id, (version, _snapshot(user)))
+    return user
+
+def invalidate_all():
+    global _generation
+    with _versions_lock:
+        _generation += 1
+        _versions.clear()
+    user_cache.clear()
+
+def _invalidate_users(changes):
+    for model, values in changes:
+        if values is None or 'id' not in values:
+            invalidate_all()
+            return
+        invalidate_user(values['id'])
+
+on_commit((User,), _invalidate_users)
@@ -0,0 +1,268 @@
+import logging, os, time
+
+from datetime import date, datetime, timedelta
+from openpyxl import load_workbook
+from sqlalchemy import insert
+
+from App import db
+from App.models import DataPangan, Kebun
+from App.utils import generate_unique_id
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK = int(os.environ.get('IMPORT_CHUNK', 1000))
+# Hanya sebagian kesalahan yang disimpan untuk ditampilkan; sisanya cukup dihitung
+MAX_REPORTED_ERRORS = 50
+ESTIMASI_PANEN_HARI = 120
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+class ImportResult:
+    """Outcome of an import: rows written and row-level errors."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+class RowError(ValueError):
+    pass
+
+def _date(value, label):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value.strip():
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(value.strip(), fmt).date()
+            except ValueError:
+                continue
+    raise RowError(f'{label} bukan tanggal yang valid ({value!r})')
+
+def _count(value, label):
+    if isinstance(value, bool):
+        raise RowError(f'{label} harus berupa angka ({value!r})')
+    try:
+        number = float(str(value).strip()) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{label} harus berupa angka ({value!r})')
+    if number < 0 or number != int(number):
+        raise RowError(f'{label} harus bilangan bulat tidak negatif ({value!r})')
+    return int(number)
+
+def _garden_ids(user_id):
+    """Maps the lowercased name and unique_id of each of the user's live gardens to its id."""
+    gardens = {}
+    query = db.session.query(Kebun.id, Kebun.nama, Kebun.unique_id).filter(Kebun.user_id == user_id, Kebun.is_deleted == False)
+    for id, nama, unique_id in query:
+        for label in (nama, unique_id):
+            if label:
+                gardens.setdefault(str(label).strip().lower(), id)
+    return gardens
+
+def parse_row(values, import_type, gardens, user_id):
+    """Validates one sheet row and returns the DataPangan column values.
+
+    Columns: kebun, komoditas, jml_bibit, tanggal_bibit and, for "panen",
+    jml_panen and tanggal_panen.
+
+    Raises:
+        RowError: If a value is missing or invalid.
+    """
+    values = list(values) + [None] * (6 - len(values))
+    kebun, komoditas = values[0], values[1]
+
+    kebun_id = None
+    if kebun not in (None, ''):
+        kebun_id = gardens.get(str(kebun).strip().lower())
+        if kebun_id is None:
+            raise RowError(f'Kebun "{kebun}" tidak terdaftar di profil Anda')
+    if not komoditas or not str(komoditas).strip():
+        raise RowError('Komoditas wajib diisi')
+
+    tanggal_bibit = _date(values[3], 'Tanggal bibit')
+    row = {
+        'kebun_id': kebun_id,
+        'komoditas': str(komoditas).strip().capitalize(),
+        'jml_bibit': _count(values[2], 'Jumlah bibit'),
+        'tanggal_bibit': tanggal_bibit,
+        'estimasi_panen': tanggal_bibit + timedelta(days=ESTIMASI_PANEN_HARI),
+        'user_id': user_id,
+        'is_deleted': False,
+    }
+    if import_type == 'panen':
+        row.update(status='Panen', jml_panen=_count(values[4], 'Jumlah panen'),
+                   tanggal_panen=_date(values[5], 'Tanggal panen'))
+    else:
+        row.update(status='Penanaman', jml_panen=0, tanggal_panen=None)
+    return row
+
+def _flush_model(model, rows, first_row, result):
+    try:
+        db.session.execute(insert(model), rows)
+        db.session.commit()
+        result.inserted += len(rows)
+    except Exception:
+        db.session.rollback()
+        # Detail error database hanya untuk log, pengguna cukup tahu baris mana yang gagal
+        logger.exception("Gagal menyimpan %s baris %s mulai baris %s", len(rows), model.__tablename__, first_row)
+        result.error(first_row, f'{len(rows)} baris mulai baris ini gagal disimpan')
+    # Beri kesempatan greenthread lain berjalan di antara chunk
+    time.sleep(0)
+
+def import_production(excel_file, import_type, user_id, chunk=IMPORT_CHUNK, progress=None):
+    """Streams a production sheet into data_pangan.
+
+    The workbook is read in openpyxl read-only mode, so memory stays flat
+    regardless of sheet size. Valid rows are inserted with one bulk INSERT
+    and commit per `chunk` rows; invalid rows are skipped and reported.
+
+    Args:
+        excel_file: Path or file object of an .xlsx workbook.
+        import_type (str): "penanaman" or "panen".
+        user_id (int): Owner of the imported rows.
+        chunk (int): Rows per INSERT/commit.
+        progress: Optional callback receiving the percentage of the sheet
+            read, called after each chunk.
+
+    Returns:
+        ImportResult
+    """
+    if import_type not in ('penanaman', 'panen'):
+        raise ValueError(f'Tipe impor tidak valid: {import_type!r}')
+
+    gardens = _garden_ids(user_id)
+    result = ImportResult()
+    wb = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        sheet = wb.active
+        # max_row diambil dari dimensi yang tersimpan di file, bisa kosong
+        total_rows = sheet.max_row or 0
+        rows, first_row = [], None
+        for row_number, values in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
+            if not any(value not in (None, '') for value in values):
+                continue
+            try:
+                rows.append(parse_row(values, import_type, gardens, user_id))
+            except RowError as e:
+                result.error(row_number, str(e))
+                continue
+            first_row = first_row or row_number
+            if len(rows) >= chunk:
+                _flush_model(DataPangan, rows, first_row, result)
+                rows, first_row = [], None
+                if progress and total_rows:
+                    progress(row_number * 100 // total_rows)
+        if rows:
+            _flush_model(DataPangan, rows, first_row, result)
+    finally:
+        wb.close()
+    return result
+
+def _coordinate(value, label, limit):
+    if isinstance(value, bool) or value in (None, ''):
+        raise RowError(f'{label} wajib diisi')
+    try:
+        number = float(str(value).strip().replace(',', '.')) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{label} harus berupa angka ({value!r})')
+    if not -limit <= number <= limit:
+        raise RowError(f'{label} harus di antara -{limit} dan {limit} ({value!r})')
+    return number
+
+def parse_garden_row(values, user_id):
+    """Validates one garden sheet row: nama, latitude, longitude, luas_kebun.
+
+    Raises:
+        RowError: If a value is missing or invalid.
+    """
+    values = list(values) + [None] * (4 - len(values))
+    nama = str(values[0]).strip() if values[0] is not None else ''
+    if not nama:
+        raise RowError('Nama kebun wajib diisi')
+    if len(nama) > 255:
+        raise RowError('Nama kebun lebih dari 255 karakter')
+    latitude = _coordinate(values[1], 'Latitude', 90)
+    longitude = _coordinate(values[2], 'Longitude', 180)
+
+    luas_kebun = None
+    if values[3] not in (None, ''):
+        try:
+            luas_kebun = float(values[3])
+        except (TypeError, ValueError):
+            raise RowError(f'Luas kebun harus berupa angka ({values[3]!r})')
+        if luas_kebun < 0:
+            raise RowError(f'Luas kebun tidak boleh negatif ({values[3]!r})')
+
+    return {
+        'nama': nama,
+        # Format yang sama dengan pemilih peta Mapbox dan parse_koordinat: "longitude, latitude"
+        'koordinat': f'{longitude:.6f}, {latitude:.6f}',
+        'luas_kebun': luas_kebun,
+        'user_id': user_id,
+        'unique_id': generate_unique_id(),
+        'is_deleted': False,
+    }
+
+def _insert_gardens(pending, result):
+    """Inserts the gardens of pending ({nama_key: (row_number, values)}) whose name is not taken yet."""
+    # Satu kueri IN per chunk lewat ix_kebun_nama; collation MySQL sudah tidak membedakan huruf besar/kecil
+    names = [values['nama'] for _, values in pending.values()]
+    taken = {nama.casefold() for (nama,) in db.session.query(Kebun.nama).filter(Kebun.nama.in_(names))}
+    rows = []
+    for key, (row_number, values) in pending.items():
+        if key in taken:
+            result.error(row_number, f'Kebun "{values["nama"]}" sudah ada, silakan gunakan nama lain')
+        else:
+            rows.append(values)
+    if rows:
+        _flush_model(Kebun, rows, min(row for row, _ in pending.values()), result)
+
+def import_gardens(excel_file, user_id, chunk=IMPORT_CHUNK):
+    """Streams a garden sheet into kebun, skipping names that already exist.
+
+    Names are deduplicated within the file (first row wins) and against the
+    database with one IN query per chunk; the new gardens of each chunk are
+    bulk-inserted together.
+
+    Args:
+        excel_file: Path or file object of an .xlsx workbook.
+        user_id (int): Owner of the imported gardens.
+        chunk (int): Rows per lookup/INSERT.
+
+    Returns:
+        ImportResult
+    """
+    result = ImportResult()
+    seen = set()
+    pending = {}
+    wb = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        for row_number, values in enumerate(wb.active.iter_rows(min_row=2, values_only=True), start=2):
+            if not any(value not in (None, '') for value in values):
+                continue
+            try:
+                garden = parse_garden_row(values, user_id)
+            except RowError as e:
+                result.error(row_number, str(e))
+                continue
+            key = garden['nama'].casefold()
+            if key in seen:
+                result.error(row_number, f'Nama kebun "{garden["nama"]}" muncul lebih dari sekali di file')
+                continue
+            seen.add(key)
+            pending[key] = (row_number, garden)
+            if len(pending) >= chunk:
+                _insert_gardens(pending, result)
+                pending = {}
+        if pending:
+            _insert_gardens(pending, result)
+    finally:
+        wb.close()
+    return result
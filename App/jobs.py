@@ -0,0 +1,192 @@
+import io, logging, os, socket, time, click
+
+from datetime import datetime, timedelta
+from flask.cli import AppGroup
+from flask_mail import Message
+from sqlalchemy import delete, update
+
+from App import db, mail
+from App.importer import import_production
+from App.models import Job, JobUpload
+
+logger = logging.getLogger(__name__)
+
+jobs_cli = AppGroup('jobs', help='Jalankan antrean pekerjaan latar belakang.')
+
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+JOB_RETRY_DELAY = int(os.environ.get('JOB_RETRY_DELAY', 30))
+# Job berstatus running lebih lama dari ini dianggap ditinggal worker yang mati
+JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 30 * 60))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+
+HANDLERS = {}
+
+def handler(kind):
+    """Registers fn(payload, progress) as the handler of jobs of `kind`.
+
+    progress(percent) records how far the job is; the return value must be
+    JSON-serializable and is stored as the job result.
+    """
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+def enqueue(kind, payload=None, user_id=None, max_attempts=3):
+    """Adds a job to the queue and commits.
+
+    Returns:
+        Job
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f'Jenis job tidak dikenal: {kind!r}')
+    job = Job(kind=kind, payload=payload or {}, created_by=user_id, max_attempts=max_attempts, run_at=datetime.now())
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def job_status(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'attempts': job.attempts,
+        'result': job.result,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+def store_upload(filename, data):
+    """Saves an uploaded file for a job in job_uploads, so a worker on another host can read it.
+
+    The handler deletes the row once it is done with the file.
+
+    Returns:
+        int: Id to pass in the job payload.
+    """
+    upload = JobUpload(filename=filename, data=data)
+    db.session.add(upload)
+    db.session.commit()
+    return upload.id
+
+def _set(job_id, **values):
+    db.session.execute(update(Job).where(Job.id == job_id).values(**values))
+    db.session.commit()
+
+def requeue_stale(now=None):
+    """Puts back jobs whose worker died mid-run, or fails them if out of attempts."""
+    now = now or datetime.now()
+    stale = Job.status == RUNNING, Job.locked_at < now - timedelta(seconds=JOB_TIMEOUT)
+    db.session.execute(update(Job).where(*stale, Job.attempts < Job.max_attempts)
+                       .values(status=QUEUED, locked_by=None, locked_at=None, run_at=now))
+    db.session.execute(update(Job).where(*stale, Job.attempts >= Job.max_attempts)
+                       .values(status=FAILED, error='Worker berhenti saat menjalankan job', finished_at=now))
+    db.session.commit()
+
+def claim(worker_id):
+    """Takes the oldest due job, or returns None.
+
+    The conditional UPDATE only succeeds for one worker per job, which works
+    the same on MySQL and SQLite without SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+    while True:
+        now = datetime.now()
+        job_id = (
+            db.session.query(Job.id)
+            .filter(Job.status == QUEUED, Job.run_at <= now)
+            .order_by(Job.run_at, Job.id)
+            .limit(1)
+            .scalar()
+        )
+        if job_id is None:
+            db.session.commit()
+            return None
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == QUEUED)
+            .values(status=RUNNING, locked_by=worker_id, locked_at=now, attempts=Job.attempts + 1)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+
+def run(job):
+    """Runs a claimed job and records its outcome; retries with exponential backoff on error."""
+    job_id, kind, payload, attempts, max_attempts = job.id, job.kind, job.payload or {}, job.attempts, job.max_attempts
+
+    def progress(percent):
+        _set(job_id, progress=max(0, min(100, int(percent))))
+
+    try:
+        result = HANDLERS[kind](payload, progress)
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Job %s (%s) gagal pada percobaan %s", job_id, kind, attempts)
+        if attempts < max_attempts:
+            _set(job_id, status=QUEUED, error=str(e), locked_by=None, locked_at=None,
+                 run_at=datetime.now() + timedelta(seconds=JOB_RETRY_DELAY * 2 ** (attempts - 1)))
+        else:
+            _set(job_id, status=FAILED, error=str(e), finished_at=datetime.now())
+        return False
+
+    _set(job_id, status=SUCCEEDED, progress=100, result=result, error=None, finished_at=datetime.now())
+    return True
+
+def work(once=False, poll=JOB_POLL_INTERVAL):
+    """Processes jobs until interrupted, or until the queue is empty if once."""
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    processed = 0
+    last_recovery = 0
+    while True:
+        if time.monotonic() - last_recovery > JOB_TIMEOUT / 2:
+            requeue_stale()
+            last_recovery = time.monotonic()
+        job = claim(worker_id)
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll)
+            continue
+        run(job)
+        processed += 1
+        # Session bersih di antara job, seperti di akhir setiap request
+        db.session.remove()
+
+@jobs_cli.command('worker')
+@click.option('--once', is_flag=True, help='Berhenti setelah antrean kosong.')
+@click.option('--poll', type=float, default=JOB_POLL_INTERVAL, show_default=True, help='Detik menunggu saat antrean kosong.')
+def worker_command(once, poll):
+    """Jalankan worker yang mengambil job dari tabel jobs."""
+    click.echo(f"{work(once=once, poll=poll)} job diproses.")
+
+@handler('email')
+def send_email(payload, progress):
+    msg = Message(subject=payload['subject'], sender=payload.get('sender'),
+                  recipients=payload['recipients'], body=payload.get('body'), html=payload.get('html'))
+    with mail.connect() as conn:
+        conn.send(msg)
+    return {'recipients': len(payload['recipients'])}
+
+@handler('import_pangan')
+def import_production_job(payload, progress):
+    upload_id = payload['upload_id']
+    try:
+        upload = db.session.get(JobUpload, upload_id)
+        if upload is None:
+            raise LookupError(f'File unggahan #{upload_id} tidak ditemukan')
+        data = upload.data
+        db.session.expunge(upload)
+        result = import_production(io.BytesIO(data), payload['import_type'], payload['user_id'], progress=progress)
+    finally:
+        # Job impor tidak diulang, jadi file dihapus juga saat gagal
+        db.session.rollback()
+        db.session.execute(delete(JobUpload).where(JobUpload.id == upload_id))
+        db.session.commit()
+    return {
+        'inserted': result.inserted,
+        'error_count': result.error_count,
+        'errors': [{'row': row, 'message': message} for row, message in result.errors],
+    }
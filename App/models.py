@@ -1,11 +1,14 @@
 from App import db, admin, app
 from flask_login import UserMixin
+from sqlalchemy import event
 from sqlalchemy.orm import column_property
 from datetime import datetime
 from flask_admin.contrib.sqla.view import ModelView
 from flask_admin.base import BaseView, expose
 from itsdangerous import URLSafeTimedSerializer
 
+from App.articles import summarize
+
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -89,6 +92,10 @@ class Kebun(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     users = db.relationship('User', secondary=user_kebun, back_populates='kebun')
 
+    __table_args__ = (
+        db.Index('ix_kebun_nama', 'nama'),
+    )
+
 User.kebun = db.relationship('Kebun', secondary=user_kebun, back_populates='users')
 
 class Komoditas(db.Model):
@@ -110,11 +117,20 @@ class DataPangan(db.Model):
     kebun_id = db.Column(db.Integer, db.ForeignKey('kebun.id', ondelete='CASCADE'), nullable=True)
     is_deleted = db.Column(db.Boolean, default=False)
 
+    __table_args__ = (
+        db.Index('ix_data_pangan_user_komoditas_bibit', 'user_id', 'komoditas', 'tanggal_bibit'),
+        db.Index('ix_data_pangan_user_komoditas_panen', 'user_id', 'komoditas', 'tanggal_panen'),
+        db.Index('ix_data_pangan_kebun_komoditas_panen', 'kebun_id', 'komoditas', 'tanggal_panen'),
+    )
+
 class Artikel(db.Model):
     __tablename__ = 'artikel'
     id = db.Column(db.Integer, primary_key=True)
     judul = db.Column(db.String(255), nullable=False)
     content = db.Column(db.Text, nullable=False)
+    # Diisi otomatis setiap kali content berubah, dipakai oleh halaman daftar artikel
+    ringkasan = db.Column(db.String(300), nullable=True)
+    waktu_baca = db.Column(db.Integer, nullable=True)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'))  # Foreign key ke tabel 'users'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_approved = db.Column(db.Boolean, default=False)
@@ -124,6 +140,15 @@ class Artikel(db.Model):
     # Relationship ke tabel User
     user = db.relationship('User', backref='artikel')
 
+    __table_args__ = (
+        db.Index('ix_artikel_status', 'is_approved', 'is_drafted', 'created_at'),
+        db.Index('ix_artikel_created_by', 'created_by', 'created_at'),
+    )
+
+@event.listens_for(Artikel.content, 'set')
+def _summarize_content(target, value, oldvalue, initiator):
+    target.ringkasan, target.waktu_baca = summarize(value)
+
 class Forum(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.Text, nullable=False)
@@ -132,4 +157,121 @@ class Forum(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     replied_at = db.Column(db.DateTime, nullable=True)
     replied_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
-    is_deleted = db.Column(db.Boolean, default=False)
\ No newline at end of file
+    is_deleted = db.Column(db.Boolean, default=False)
+
+    __table_args__ = (
+        db.Index('ix_forum_created_by', 'created_by', 'created_at'),
+    )
+
+class HargaKomoditas(db.Model):
+    __tablename__ = 'harga_komoditas'
+    id = db.Column(db.Integer, primary_key=True)
+    tanggal = db.Column(db.Date, nullable=False)
+    kab_kota = db.Column(db.Integer, nullable=False)
+    level_harga = db.Column(db.Integer, nullable=False)
+    komoditas = db.Column(db.String(100), nullable=False)
+    geomean = db.Column(db.Float, nullable=True)  # NULL jika panelharga mengirim "-"
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.UniqueConstraint('kab_kota', 'level_harga', 'tanggal', 'komoditas', name='uq_harga_komoditas_hari'),
+    )
+
+class PrakiraanCuaca(db.Model):
+    __tablename__ = 'prakiraan_cuaca'
+    id = db.Column(db.Integer, primary_key=True)
+    adm4 = db.Column(db.String(20), nullable=False, unique=True)
+    desa = db.Column(db.String(100), nullable=True)
+    kecamatan = db.Column(db.String(100), nullable=True)
+    cuaca = db.Column(db.JSON, nullable=False)  # [[prakiraan per jam], ...] per hari, hanya field yang dipakai
+    analysis_date = db.Column(db.String(30), nullable=True)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+class CuacaKebun(db.Model):
+    __tablename__ = 'cuaca_kebun'
+    id = db.Column(db.Integer, primary_key=True)
+    kebun_id = db.Column(db.Integer, db.ForeignKey('kebun.id', ondelete='CASCADE'), nullable=False, unique=True)
+    latitude = db.Column(db.Float, nullable=False)  # Titik grid yang dipakai saat mengambil prakiraan
+    longitude = db.Column(db.Float, nullable=False)
+    harian = db.Column(db.JSON, nullable=False)  # [{tanggal, weather_code, suhu_max, suhu_min, hujan_mm}, ...]
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+class JawabanAsisten(db.Model):
+    __tablename__ = 'jawaban_asisten'
+    id = db.Column(db.Integer, primary_key=True)
+    kunci = db.Column(db.String(40), nullable=False, unique=True)  # sha1 dari pertanyaan yang dinormalisasi
+    pertanyaan = db.Column(db.Text, nullable=False)
+    balasan = db.Column(db.Text, nullable=False)  # HTML hasil markdown2
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+
+class ProduksiHarian(db.Model):
+    """Rollup of DataPangan per garden, commodity and day, maintained by App.rollup."""
+    __tablename__ = 'produksi_harian'
+    id = db.Column(db.Integer, primary_key=True)
+    kebun_id = db.Column(db.Integer, nullable=False, default=0)  # 0 untuk data tanpa kebun
+    komoditas = db.Column(db.String(50), nullable=False)
+    tanggal = db.Column(db.Date, nullable=False)  # tanggal_panen, atau tanggal_bibit jika belum panen
+    jml_panen = db.Column(db.BigInteger, nullable=False, default=0)
+    jml_bibit = db.Column(db.BigInteger, nullable=False, default=0)
+    jumlah_data = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('kebun_id', 'komoditas', 'tanggal', name='uq_produksi_harian'),
+    )
+
+class Job(db.Model):
+    """Background job run by `flask jobs worker`, see App.jobs."""
+    __tablename__ = 'jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)  # persen
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+        # Job impor yang baru selesai, dibaca sinkronisasi cache statistik di App.stats
+        db.Index('ix_jobs_kind_finished', 'kind', 'finished_at'),
+    )
+
+class JobUpload(db.Model):
+    """File uploaded for a job, kept in the database so the worker can read it from any host."""
+    __tablename__ = 'job_uploads'
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    # MEDIUMBLOB di MySQL, cukup untuk MAX_CONTENT_LENGTH 16MB
+    data = db.Column(db.LargeBinary(length=2 ** 24 - 1), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+def _archive_table(model, *indexes):
+    """Archive copy of a model's table for App.archive.
+
+    Same columns without defaults or foreign keys, so archived rows never
+    block deletes in the live tables, plus when and why they were archived.
+    """
+    columns = [
+        db.Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False,
+                  nullable=not column.primary_key)
+        for column in model.__table__.columns
+    ]
+    return db.Table(
+        f'arsip_{model.__table__.name}',
+        *columns,
+        db.Column('archived_at', db.DateTime, nullable=False),
+        db.Column('alasan', db.String(20), nullable=False),  # 'dihapus' atau 'musim_lama'
+        *indexes,
+    )
+
+arsip_data_pangan = _archive_table(DataPangan, db.Index('ix_arsip_data_pangan_user', 'user_id', 'archived_at'))
+arsip_forum = _archive_table(Forum, db.Index('ix_arsip_forum_created_by', 'created_by', 'archived_at'))
@@ -0,0 +1,191 @@
+import os
+
+from datetime import date, datetime
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import and_, or_, select
+
+from App import db
+
+# Batas atas hitungan total="approx"; lebih dari ini cukup ditampilkan sebagai "> N"
+APPROX_COUNT_LIMIT = int(os.environ.get('APPROX_COUNT_LIMIT', 1000))
+
+class KeysetPage:
+    """One page of a keyset-paginated query.
+
+    Iterating yields the rows, like flask_sqlalchemy's Pagination. The
+    cursors are opaque strings to pass back as the `cursor` argument;
+    they are None when there is no page in that direction.
+    """
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None, total_capped=False):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        # True jika total hanya batas bawah (hitungan "approx" mencapai APPROX_COUNT_LIMIT)
+        self.total_capped = total_capped
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='keyset-cursor')
+
+def _encode(key, column, row, direction):
+    value = getattr(row, column.key)
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    return _serializer().dumps([key, direction, value, row.id])
+
+def _decode(key, column, cursor):
+    """Returns (direction, value, id), or None if cursor is missing, forged or for another sort."""
+    if not cursor:
+        return None
+    try:
+        cursor_key, direction, value, ident = _serializer().loads(cursor)
+    except (BadSignature, ValueError, TypeError):
+        return None
+    if cursor_key != key or direction not in ('next', 'prev'):
+        return None
+    if value is not None:
+        python_type = column.type.python_type
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        elif python_type is date:
+            value = date.fromisoformat(value)
+    return direction, value, ident
+
+def _segments(query, column, id_column, descending, nulls_first):
+    """Splits the ordering into blocks that each read one index range in order.
+
+    MySQL has no NULLS LAST and cannot walk an index in order when NULL
+    placement is part of ORDER BY, so a nullable column is paged as a
+    non-NULL block ordered by (column, id) and a NULL block ordered by id.
+
+    Returns:
+        list of (is_null_block, query) in travel order.
+    """
+    direction = (lambda c: c.desc()) if descending else (lambda c: c.asc())
+    if column is id_column:
+        return [(False, query.order_by(direction(id_column)))]
+    values = query.order_by(direction(column), direction(id_column))
+    if not column.expression.nullable:
+        return [(False, values)]
+    blocks = [(False, values.filter(column.isnot(None))),
+              (True, query.filter(column.is_(None)).order_by(direction(id_column)))]
+    return blocks[::-1] if nulls_first else blocks
+
+def _seek(column, id_column, value, ident, descending, is_null_block):
+    """WHERE clause for rows strictly after (value, ident) within one block."""
+    id_beyond = id_column < ident if descending else id_column > ident
+    if column is id_column or is_null_block:
+        return id_beyond
+    return or_(column < value if descending else column > value, and_(column == value, id_beyond))
+
+def approximate_count(query, limit=APPROX_COUNT_LIMIT):
+    """Counts the rows of query, stopping after limit + 1 rows.
+
+    Returns:
+        tuple: (count, capped); when capped, count is limit and the real
+        total is larger.
+    """
+    entity = query.column_descriptions[0]['entity']
+    limited = query.order_by(None).with_entities(entity.id).limit(limit + 1).subquery()
+    count = db.session.execute(select(db.func.count()).select_from(limited)).scalar()
+    return min(count, limit), count > limit
+
+def page_queries(query, column, descending=False, after=None, nulls_first=False):
+    """Returns the queries keyset_paginate reads for one page, in travel order.
+
+    Rows are taken from each query in turn until the page is full. App.queryplan
+    runs EXPLAIN on these to check that every page is an in-order index read.
+
+    Args:
+        query: Query over a single model with an `id` primary key.
+        column: Model attribute to sort by; `id` breaks ties.
+        descending (bool): Direction of travel.
+        after (tuple): (value, id) of the row the page starts after, or None
+            for the first page.
+        nulls_first (bool): Read the NULL block before the non-NULL one.
+    """
+    id_column = query.column_descriptions[0]['entity'].id
+    blocks = _segments(query.order_by(None), column, id_column, descending, nulls_first)
+    if after is not None:
+        # Mulai dari blok tempat cursor berada; seek hanya berlaku di blok itu
+        in_null_block = len(blocks) > 1 and after[0] is None
+        while blocks[0][0] != in_null_block:
+            blocks.pop(0)
+        is_null, first = blocks[0]
+        blocks[0] = (is_null, first.filter(_seek(column, id_column, after[0], after[1], descending, is_null)))
+    return [block for _, block in blocks]
+
+def keyset_paginate(query, column, descending=False, cursor=None, per_page=10, key=None, total=None):
+    """Paginates query by (column, id) using WHERE seeks instead of OFFSET.
+
+    Each page reads at most per_page + 1 rows in index order no matter how
+    deep it is. NULLs in column always sort last; a nullable column is read
+    as two blocks (non-NULL, then NULL), so a page that crosses from one
+    to the other costs two range reads.
+
+    Args:
+        query: Query over a single model with an `id` primary key.
+        column: Model attribute to sort by; `id` breaks ties.
+        descending (bool): Sort direction.
+        cursor (str): Cursor from a previous page, or None for the first page.
+            Invalid cursors, or cursors from another sort, restart at page one.
+        per_page (int): Rows per page.
+        key (str): Name of the sort, embedded in the cursor; defaults to
+            "<column>:<asc|desc>".
+        total (str): None, "approx" for a COUNT capped at
+            APPROX_COUNT_LIMIT (see KeysetPage.total_capped) or "exact" for
+            COUNT(*).
+
+    Returns:
+        KeysetPage
+    """
+    key = key or f"{column.key}:{'desc' if descending else 'asc'}"
+
+    position = _decode(key, column, cursor)
+    backwards = position is not None and position[0] == 'prev'
+    # Mundur = membaca urutan terbalik (blok NULL lebih dulu) lalu membalik hasilnya
+    travel_desc = descending != backwards
+
+    after = position[1:] if position is not None else None
+    rows = []
+    for block in page_queries(query, column, travel_desc, after, nulls_first=backwards):
+        rows += block.limit(per_page + 1 - len(rows)).all()
+        if len(rows) > per_page:
+            break
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if more or backwards:
+            next_cursor = _encode(key, column, rows[-1], 'next')
+        if (more and backwards) or (position is not None and not backwards):
+            prev_cursor = _encode(key, column, rows[0], 'prev')
+
+    capped = False
+    if total == 'exact':
+        total = query.order_by(None).count()
+    elif total == 'approx':
+        total, capped = approximate_count(query)
+
+    return KeysetPage(rows, per_page, next_cursor, prev_cursor, total, capped)
@@ -0,0 +1,221 @@
+import logging, os, click, requests
+
+from datetime import date, datetime, timedelta
+from flask.cli import AppGroup
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from App import db
+from App.cache import TTLCache
+from App.gateway import gateway
+from App.models import HargaKomoditas
+
+logger = logging.getLogger(__name__)
+
+PANELHARGA_URL = "https://panelharga.badanpangan.go.id/data/kabkota-range-by-levelharga/{kab_kota}/{komoditas_id}/{start_date}/{end_date}"
+
+PRICE_CACHE_TTL = int(os.environ.get('PRICE_CACHE_TTL', 15 * 60))
+PRICE_CACHE_STALE_TTL = int(os.environ.get('PRICE_CACHE_STALE_TTL', 60 * 60))
+# Harga beberapa hari terakhir bisa terlambat terbit, jadi hari tanpa nilai dicek ulang
+PRICE_RECHECK_DAYS = int(os.environ.get('PRICE_RECHECK_DAYS', 3))
+# Rentang dan wilayah yang boleh diminta lewat API publik
+PRICE_MAX_DAYS = int(os.environ.get('PRICE_MAX_DAYS', 366))
+PRICE_KAB_KOTA = {int(value) for value in os.environ.get('PRICE_KAB_KOTA', '458').split(',')}
+PRICE_LEVELS = {int(value) for value in os.environ.get('PRICE_LEVELS', '1,2,3').split(',')}
+# ER_LOCK_DEADLOCK MySQL; transaksi yang kalah aman diulang oleh request berikutnya
+MYSQL_DEADLOCK = 1213
+
+# Baris penanda untuk hari yang sudah diambil tetapi tidak dikirim panelharga (akhir pekan, libur)
+NO_DATA = ''
+
+# Dipakai bersama oleh /api/get-price-data dan /api/price-data
+price_cache = TTLCache(ttl=PRICE_CACHE_TTL, stale_ttl=PRICE_CACHE_STALE_TTL, maxsize=512, name='harga')
+
+harga_cli = AppGroup('harga', help='Kelola data harga komoditas lokal.')
+
+def _fetch_upstream(kab_kota, komoditas_id, start_date, end_date):
+    url = PANELHARGA_URL.format(kab_kota=kab_kota, komoditas_id=komoditas_id,
+                                start_date=start_date.isoformat(), end_date=end_date.isoformat())
+    response = gateway.get(url)
+    response.raise_for_status()
+    return response.json()
+
+def _parse_date(value):
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError('Format tanggal harus YYYY-MM-DD')
+
+def _missing_ranges(kab_kota, komoditas_id, start, end):
+    """Returns the contiguous (start, end) date ranges not yet held locally.
+
+    Days stored with only NO_DATA markers or empty prices count as held once
+    they are older than PRICE_RECHECK_DAYS.
+    """
+    recheck_from = date.today() - timedelta(days=PRICE_RECHECK_DAYS)
+    held = {
+        tanggal
+        for tanggal, filled in (
+            db.session.query(HargaKomoditas.tanggal, func.count(HargaKomoditas.geomean))
+            .filter(HargaKomoditas.kab_kota == kab_kota,
+                    HargaKomoditas.level_harga == komoditas_id,
+                    HargaKomoditas.tanggal.between(start, end))
+            .group_by(HargaKomoditas.tanggal)
+        )
+        if filled or tanggal < recheck_from
+    }
+
+    ranges = []
+    day = start
+    while day <= end:
+        if day not in held:
+            gap_start = day
+            while day + timedelta(days=1) <= end and day + timedelta(days=1) not in held:
+                day += timedelta(days=1)
+            ranges.append((gap_start, day))
+        day += timedelta(days=1)
+    return ranges
+
+def _store(kab_kota, komoditas_id, start, end, payload):
+    """Replaces the local rows for a fetched range with the upstream payload.
+
+    Days of the range missing from the payload get a NO_DATA marker row so
+    they are not fetched again. If a concurrent request stores an
+    overlapping range first (duplicate key or deadlock), the write is
+    rolled back and its rows are kept; other database errors are raised.
+
+    Returns:
+        int: Number of price rows written, markers excluded.
+    """
+    now = datetime.now()
+    rows = []
+    for item in payload.get("data", []):
+        for date_data in item.get("by_date", []):
+            geomean = date_data.get("geomean")
+            rows.append({
+                'tanggal': _parse_date(date_data["date"]),
+                'kab_kota': kab_kota,
+                'level_harga': komoditas_id,
+                'komoditas': item["name"],
+                'geomean': None if geomean in (None, "-", "") else float(geomean),
+                'fetched_at': now,
+            })
+    written = len(rows)
+
+    returned = {row['tanggal'] for row in rows}
+    day = start
+    while day <= end:
+        if day not in returned:
+            rows.append({'tanggal': day, 'kab_kota': kab_kota, 'level_harga': komoditas_id,
+                         'komoditas': NO_DATA, 'geomean': None, 'fetched_at': now})
+        day += timedelta(days=1)
+
+    try:
+        HargaKomoditas.query.filter(
+            HargaKomoditas.kab_kota == kab_kota,
+            HargaKomoditas.level_harga == komoditas_id,
+            HargaKomoditas.tanggal.between(start, end),
+        ).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(HargaKomoditas.__table__.insert(), rows)
+        db.session.commit()
+    except (IntegrityError, OperationalError) as e:
+        db.session.rollback()
+        if isinstance(e, OperationalError) and getattr(e.orig, 'args', (None,))[0] != MYSQL_DEADLOCK:
+            raise
+        # Duplikat atau deadlock dari request lain yang menyimpan hari yang sama; data mereka dipakai
+        logger.warning("Harga %s..%s sudah disimpan oleh proses lain", start, end, exc_info=True)
+        return 0
+    return written
+
+def backfill(kab_kota, komoditas_id, start, end):
+    """Fetches from panelharga only the days in [start, end] missing from harga_komoditas.
+
+    Returns:
+        int: Number of rows written.
+    """
+    written = 0
+    for gap_start, gap_end in _missing_ranges(kab_kota, komoditas_id, start, end):
+        payload = _fetch_upstream(kab_kota, komoditas_id, gap_start, gap_end)
+        written += _store(kab_kota, komoditas_id, gap_start, gap_end, payload)
+    return written
+
+def _read_local(kab_kota, komoditas_id, start, end):
+    """Rebuilds the panelharga payload shape from local rows."""
+    rows = (
+        db.session.query(HargaKomoditas.komoditas, HargaKomoditas.tanggal, HargaKomoditas.geomean)
+        .filter(HargaKomoditas.kab_kota == kab_kota,
+                HargaKomoditas.level_harga == komoditas_id,
+                HargaKomoditas.tanggal.between(start, end),
+                HargaKomoditas.komoditas != NO_DATA)
+        .order_by(HargaKomoditas.komoditas, HargaKomoditas.tanggal)
+        .all()
+    )
+
+    data = {}
+    for komoditas, tanggal, geomean in rows:
+        item = data.setdefault(komoditas, {"name": komoditas, "by_date": []})
+        item["by_date"].append({
+            "date": tanggal.isoformat(),
+            "geomean": "-" if geomean is None else geomean,
+        })
+    return {"data": list(data.values())}
+
+def _load_price_range(kab_kota, komoditas_id, start, end):
+    try:
+        backfill(kab_kota, komoditas_id, start, end)
+    except requests.exceptions.RequestException as e:
+        db.session.rollback()
+        payload = _read_local(kab_kota, komoditas_id, start, end)
+        if not payload["data"]:
+            raise
+        # panelharga sedang bermasalah, sajikan data lokal yang sudah ada
+        logger.warning("Backfill harga %s..%s gagal, memakai data lokal: %s", start, end, e)
+        return payload
+    return _read_local(kab_kota, komoditas_id, start, end)
+
+def get_price_range(kab_kota, komoditas_id, start_date, end_date):
+    """Returns the price payload for a region, price level and date range.
+
+    Answers from the local harga_komoditas table, fetching from panelharga
+    only the days it does not hold yet. Results are shared across requests
+    through price_cache, so concurrent requests for the same range trigger a
+    single load and expired entries are refreshed in the background.
+
+    Args:
+        kab_kota (int): Regency/city ID on panelharga.
+        komoditas_id (int): Price level ID on panelharga.
+        start_date (str): The starting date in YYYY-MM-DD format.
+        end_date (str): The ending date in YYYY-MM-DD format.
+
+    Returns:
+        dict: A payload shaped like panelharga's ({"data": [{"name", "by_date"}]}).
+
+    Raises:
+        ValueError: If a date is not in YYYY-MM-DD format, the range is
+            reversed or longer than PRICE_MAX_DAYS, or the region or price
+            level is not in PRICE_KAB_KOTA/PRICE_LEVELS.
+        requests.exceptions.RequestException: If panelharga fails and nothing is held locally.
+    """
+    if kab_kota not in PRICE_KAB_KOTA or komoditas_id not in PRICE_LEVELS:
+        raise ValueError('Wilayah atau level harga tidak tersedia')
+    start, end = _parse_date(start_date), _parse_date(end_date)
+    if end < start:
+        raise ValueError('Tanggal akhir tidak boleh sebelum tanggal awal')
+    if (end - start).days + 1 > PRICE_MAX_DAYS:
+        raise ValueError(f'Rentang tanggal maksimal {PRICE_MAX_DAYS} hari')
+    key = (kab_kota, komoditas_id, start, end)
+    return price_cache.get_or_load(key, lambda: _load_price_range(*key))
+
+@harga_cli.command('backfill')
+@click.option('--kab-kota', default=458, show_default=True, help='ID kabupaten/kota panelharga.')
+@click.option('--level', 'komoditas_id', default=3, show_default=True, help='ID level harga panelharga.')
+@click.option('--days', default=180, show_default=True, help='Jumlah hari ke belakang.')
+def backfill_command(kab_kota, komoditas_id, days):
+    """Isi tabel harga_komoditas untuk rentang hari yang belum tersimpan."""
+    end = date.today()
+    start = end - timedelta(days=days)
+    written = backfill(kab_kota, komoditas_id, start, end)
+    click.echo(f"{written} baris harga disimpan untuk {start} s/d {end}.")
@@ -0,0 +1,35 @@
+from sqlalchemy.orm import defer
+
+from App.models import DataPangan, Forum, Artikel, Kebun
+
+# Kueri jalur utama views dibangun di sini agar App.queryplan memeriksa kueri yang sama persis
+
+# Kolom urut tabel produksi di dataproduksi; hanya kolom tanggal yang punya index (user_id, komoditas, kolom)
+PRODUCTION_SORT_COLUMNS = {
+    'kebun': DataPangan.kebun_id,
+    'bibit': DataPangan.jml_bibit,
+    'tanam': DataPangan.tanggal_bibit,
+    'status': DataPangan.status,
+    'hasil': DataPangan.jml_panen,
+}
+PRODUCTION_DEFAULT_SORT = DataPangan.tanggal_panen
+
+def production(user_id, komoditas):
+    """One farmer's DataPangan rows of one commodity, paged by dataproduksi."""
+    return DataPangan.query.filter_by(user_id=user_id, komoditas=komoditas)
+
+def user_gardens(user_id):
+    return Kebun.query.filter_by(user_id=user_id, is_deleted=False)
+
+def user_questions(user_id):
+    return Forum.query.filter_by(created_by=user_id)
+
+def author_articles(user_id):
+    return Artikel.query.filter_by(created_by=user_id)
+
+def article_list():
+    """Articles paged on the personal page; the body is only loaded by read_article."""
+    return Artikel.query.options(defer(Artikel.content))
+
+def question_list():
+    return Forum.query
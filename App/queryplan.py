@@ -0,0 +1,87 @@
+import sys, click
+
+from datetime import date
+from flask.cli import AppGroup
+
+from App import db, queries
+from App.models import Artikel, Forum
+from App.pagination import page_queries
+from App.rollup import chart_query
+from App.stats import farmer_rows_query
+
+kueri_cli = AppGroup('kueri', help='Periksa rencana eksekusi kueri utama.')
+
+# Nilai contoh untuk parameter kueri; rencana MySQL tidak bergantung pada nilainya
+USER_ID = 1
+KOMODITAS = 'Cabai'
+TANGGAL = date(2024, 1, 1)
+ROW_ID = 100
+
+def _pages(query, column, descending):
+    """Every block query keyset_paginate can read: first page, seek, NULL block, backwards."""
+    pages = page_queries(query, column, descending)
+    pages += page_queries(query, column, descending, after=(TANGGAL, ROW_ID))
+    pages += page_queries(query, column, not descending, after=(TANGGAL, ROW_ID), nulls_first=True)
+    if column.expression.nullable:
+        pages += page_queries(query, column, descending, after=(None, ROW_ID))
+    return pages
+
+def _id_pages(query, column):
+    return page_queries(query, column) + page_queries(query, column, after=(ROW_ID, ROW_ID)) \
+        + page_queries(query, column, True, after=(ROW_ID, ROW_ID), nulls_first=True)
+
+# Kueri jalur utama, dibangun dengan builder yang sama dengan views (App.queries).
+# Kolom urut dataproduksi lain dipilih pengguna dan sengaja tidak ber-index.
+HOT_QUERIES = {
+    'dataproduksi: urut tanggal_panen': lambda: _pages(
+        queries.production(USER_ID, KOMODITAS), queries.PRODUCTION_DEFAULT_SORT, True),
+    'dataproduksi: urut tanggal_bibit': lambda: _pages(
+        queries.production(USER_ID, KOMODITAS), queries.PRODUCTION_SORT_COLUMNS['tanam'], True),
+    'dashboard/dataproduksi: statistik petani': lambda: [farmer_rows_query(USER_ID)],
+    'dashboard: kebun milik petani': lambda: [queries.user_gardens(USER_ID)],
+    'rindangtalk: pertanyaan milik pengguna': lambda: [queries.user_questions(USER_ID)],
+    'write_article: artikel milik penulis': lambda: [queries.author_articles(USER_ID)],
+    'personal: halaman artikel': lambda: _id_pages(queries.article_list(), Artikel.id),
+    'personal: halaman forum': lambda: _id_pages(queries.question_list(), Forum.id),
+    'admin: grafik rollup per kebun': lambda: [chart_query(kebun_id=1)],
+}
+
+def explain(query):
+    """Runs EXPLAIN for a Query with bound parameters and returns its plan rows as dicts."""
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    result = db.session.connection().exec_driver_sql(f'EXPLAIN {compiled}', compiled.params)
+    return [dict(row._mapping) for row in result]
+
+def problems(plan):
+    """Returns the plan rows that scan a whole table or sort outside an index."""
+    return [
+        row for row in plan
+        if row.get('type') == 'ALL' or 'Using filesort' in (row.get('Extra') or '')
+    ]
+
+def check_plans():
+    """EXPLAINs every HOT_QUERIES query; yields (name, plan, problems) per query."""
+    for name, build in HOT_QUERIES.items():
+        for query in build():
+            plan = explain(query)
+            yield name, plan, problems(plan)
+
+def format_row(row):
+    return (f"{row.get('table')}: type={row.get('type')} key={row.get('key')} "
+            f"rows={row.get('rows')} extra={row.get('Extra')}")
+
+@kueri_cli.command('explain')
+@click.option('--verbose', '-v', is_flag=True, help='Tampilkan rencana setiap kueri.')
+def explain_command(verbose):
+    """Jalankan EXPLAIN pada kueri utama; gagal jika ada full scan atau filesort."""
+    failed = 0
+    for name, plan, bad in check_plans():
+        click.echo(f"[{'GAGAL' if bad else 'ok'}] {name}")
+        if verbose or bad:
+            for row in plan:
+                click.echo(f"    {format_row(row)}")
+        failed += bool(bad)
+
+    if failed:
+        click.echo(f"{failed} kueri memakai full scan atau filesort.", err=True)
+        sys.exit(1)
@@ -0,0 +1,127 @@
+import hashlib, json, logging, os, re, threading, click
+
+from flask.cli import AppGroup
+
+from App.gateway import gateway
+
+logger = logging.getLogger(__name__)
+
+EMSIFA_URL = 'https://emsifa.github.io/api-wilayah-indonesia/api/{path}'
+DATASET_PATH = os.path.join(os.path.dirname(__file__), 'data', 'wilayah.json')
+# Hanya path emsifa yang dikenal yang diteruskan dan disimpan di memori
+PATH_PATTERN = re.compile(r'^(provinces|(province|regencies|regency|districts|district|villages|village)/\d+)\.json$')
+# Path tunggal dijawab dari indeks ID; panjang kode BPS menentukan tingkat wilayahnya
+SINGLE_PATH = re.compile(r'^(province|regency|district|village)/(\d+)\.json$')
+ID_LENGTHS = {'province': 2, 'regency': 4, 'district': 7, 'village': 10}
+CACHE_MAX_AGE = 7 * 24 * 3600
+
+wilayah_cli = AppGroup('wilayah', help='Kelola dataset wilayah Indonesia lokal.')
+
+class RegionIndex:
+    """In-memory index of the emsifa region dataset.
+
+    The dataset file maps each emsifa JSON path (e.g. "regencies/82.json")
+    to the list it returns. On load every path is serialized once and given
+    an ETag, and every region is indexed by ID for name lookups.
+    """
+
+    def __init__(self, paths):
+        self._docs = {}
+        self.by_id = {}
+        self._lock = threading.Lock()
+        for path, regions in paths.items():
+            self.add(path, regions)
+
+    def add(self, path, regions):
+        body = json.dumps(regions, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            self._docs[path] = (body, etag)
+            # Path tunggal seperti "regency/8271.json" berisi satu objek, bukan list
+            for region in regions if isinstance(regions, list) else [regions]:
+                self.by_id[str(region['id'])] = region
+
+    def document(self, path):
+        """Returns (body, etag) for an emsifa path, or None if it is not held."""
+        return self._docs.get(path)
+
+    def name(self, region_id):
+        region = self.by_id.get(str(region_id))
+        return region['name'] if region else None
+
+    def __len__(self):
+        return len(self._docs)
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """Loads the bundled dataset once per process."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                paths = {}
+                if os.path.exists(DATASET_PATH):
+                    with open(DATASET_PATH, encoding='utf-8') as f:
+                        paths = json.load(f)
+                else:
+                    logger.warning("Dataset wilayah %s tidak ditemukan, semua path diambil dari emsifa", DATASET_PATH)
+                _index = RegionIndex(paths)
+    return _index
+
+def _fetch_upstream(path):
+    response = gateway.get(EMSIFA_URL.format(path=path))
+    response.raise_for_status()
+    return response.json()
+
+def get_document(path):
+    """Returns (body, etag) for an emsifa path.
+
+    Single-region paths such as "regency/8271.json" are answered from the
+    ID index of the bundled dataset. Other paths missing from it are
+    fetched once from emsifa and then kept in the in-memory index for the
+    rest of the process.
+
+    Raises:
+        KeyError: If path is not a known emsifa path.
+        requests.exceptions.RequestException: If the path is not held and emsifa fails.
+    """
+    index = get_index()
+    doc = index.document(path)
+    single = SINGLE_PATH.match(path)
+    if doc is None and single and len(single.group(2)) == ID_LENGTHS[single.group(1)]:
+        region = index.by_id.get(single.group(2))
+        if region is not None:
+            index.add(path, region)
+            doc = index.document(path)
+    if doc is None:
+        if not PATH_PATTERN.match(path):
+            raise KeyError(path)
+        index.add(path, _fetch_upstream(path))
+        doc = index.document(path)
+    return doc
+
+def region_name(value):
+    """Resolves a stored region ID to its name; names are returned unchanged."""
+    if not value or not str(value).isdigit():
+        return value
+    return get_index().name(value) or value
+
+@wilayah_cli.command('sync')
+@click.option('--province', 'province_ids', multiple=True, default=['82'], show_default=True,
+              help='ID provinsi yang diunduh lengkap sampai kelurahan/desa.')
+def sync_command(province_ids):
+    """Perbarui App/data/wilayah.json dari emsifa (manual, hasilnya di-commit)."""
+    paths = {'provinces.json': _fetch_upstream('provinces.json')}
+    for province_id in province_ids:
+        regencies = paths[f'regencies/{province_id}.json'] = _fetch_upstream(f'regencies/{province_id}.json')
+        for regency in regencies:
+            districts = paths[f'districts/{regency["id"]}.json'] = _fetch_upstream(f'districts/{regency["id"]}.json')
+            for district in districts:
+                paths[f'villages/{district["id"]}.json'] = _fetch_upstream(f'villages/{district["id"]}.json')
+
+    os.makedirs(os.path.dirname(DATASET_PATH), exist_ok=True)
+    with open(DATASET_PATH, 'w', encoding='utf-8') as f:
+        json.dump(paths, f, ensure_ascii=False, separators=(',', ':'))
+    click.echo(f"{len(paths)} berkas wilayah disimpan ke {DATASET_PATH}.")
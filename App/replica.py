@@ -0,0 +1,143 @@
+import logging, os, threading, time
+
+from functools import wraps
+from flask import g, has_request_context, request, session as http_session
+from flask_sqlalchemy.session import Session
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 10))
+# Setelah menulis, request berikutnya dari browser yang sama tetap membaca dari primary selama jendela ini
+READ_AFTER_WRITE_WINDOW = float(os.environ.get('READ_AFTER_WRITE_WINDOW', 10))
+
+def replica_uri(primary_port):
+    """Builds the replica URI from MYSQL_REPLICA_* env vars, or None if no replica is configured.
+
+    User, password and database default to the primary's.
+    """
+    host = os.environ.get('MYSQL_REPLICA_HOST')
+    if not host:
+        return None
+    return (f'mysql+pymysql://{os.environ.get("MYSQL_REPLICA_USER", os.environ.get("MYSQLUSER"))}:'
+            f'{os.environ.get("MYSQL_REPLICA_PASSWORD", os.environ.get("MYSQLPASSWORD"))}@'
+            f'{host}:'
+            f'{os.environ.get("MYSQL_REPLICA_PORT", primary_port)}/'
+            f'{os.environ.get("MYSQL_REPLICA_DATABASE", os.environ.get("MYSQLDATABASE"))}')
+
+class ReplicaHealth:
+    """Tracks replication lag, checking it at most once per interval.
+
+    Only one caller runs the check; the others keep using the last result.
+    """
+
+    def __init__(self, max_lag=REPLICA_MAX_LAG, interval=REPLICA_LAG_CHECK_INTERVAL):
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag = None
+        self.healthy = False
+        self.checked_at = None
+        self.replica_reads = 0
+        self.primary_fallbacks = 0
+        self._lock = threading.Lock()
+
+    def _measure(self, engine):
+        with engine.connect() as conn:
+            try:
+                row = conn.exec_driver_sql('SHOW REPLICA STATUS').mappings().first()
+            except Exception:
+                # MySQL < 8.0.22 dan MariaDB
+                row = conn.exec_driver_sql('SHOW SLAVE STATUS').mappings().first()
+        if row is None:
+            # Instance berdiri sendiri (mis. dua database lokal saat pengujian)
+            return 0
+        return row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+
+    def check(self, engine):
+        """Returns True if the replica may serve reads right now."""
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.interval:
+            return self.healthy
+        if not self._lock.acquire(blocking=False):
+            return self.healthy
+        try:
+            lag = self._measure(engine)
+            healthy = lag is not None and lag <= self.max_lag
+            if healthy != self.healthy:
+                logger.warning("Replica %s (lag=%s)", 'dipakai kembali' if healthy else 'dilewati', lag)
+            self.lag, self.healthy = lag, healthy
+        except Exception as e:
+            if self.healthy:
+                logger.warning("Pemeriksaan replica gagal, membaca dari primary: %s", e)
+            self.lag, self.healthy = None, False
+        finally:
+            self.checked_at = time.monotonic()
+            self._lock.release()
+        return self.healthy
+
+    def stats(self):
+        return {
+            'healthy': self.healthy,
+            'lag': self.lag,
+            'replica_reads': self.replica_reads,
+            'primary_fallbacks': self.primary_fallbacks,
+        }
+
+replica_health = ReplicaHealth()
+
+def _wants_replica():
+    if not has_request_context() or not g.get('db_read_replica'):
+        return False
+    return http_session.get('db_primary_until', 0) <= time.time()
+
+class RoutingSession(Session):
+    """Session that sends reads of @read_replica endpoints to the replica bind.
+
+    Flushes, INSERT/UPDATE/DELETE and SELECT ... FOR UPDATE always use the
+    primary, and once a session has written, every later statement in it
+    stays on the primary too (the scoped session is discarded at the end
+    of each request, which releases the pin). Without a configured replica, or while it
+    lags more than REPLICA_MAX_LAG seconds, everything goes to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+
+        writing = (
+            self._flushing
+            or getattr(clause, 'is_dml', False)
+            or getattr(clause, '_for_update_arg', None) is not None
+        )
+        if writing:
+            self.info['db_pinned'] = True
+            if has_request_context():
+                g.db_wrote = True
+
+        engines = self._db.engines
+        if not self.info.get('db_pinned') and REPLICA_BIND in engines and _wants_replica():
+            if replica_health.check(engines[REPLICA_BIND]):
+                replica_health.replica_reads += 1
+                return engines[REPLICA_BIND]
+            replica_health.primary_fallbacks += 1
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def read_replica(f):
+    """Marks a view whose GET/HEAD requests may read from the replica."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            g.db_read_replica = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+def init_app(app):
+    """Keeps a browser on the primary for READ_AFTER_WRITE_WINDOW seconds after it wrote."""
+    @app.after_request
+    def pin_after_write(response):
+        if g.get('db_wrote'):
+            http_session['db_primary_until'] = time.time() + READ_AFTER_WRITE_WINDOW
+        return response
+
@@ -0,0 +1,124 @@
+import io, os, threading
+
+from datetime import date
+from xml.sax.saxutils import escape
+from babel.dates import format_date
+from babel.numbers import format_decimal
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, TA_CENTER, TA_RIGHT
+from reportlab.lib.units import cm, mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Image, Spacer
+
+from App import db
+from App.models import DataPangan
+
+REPORT_LOCALE = 'id_ID'
+REPORT_FONTS = ('PlusJakartaSans-Regular', 'PlusJakartaSans-Bold', 'PlusJakartaSans-Italic')
+LOGO_HEIGHT = 12 * mm
+MARGIN = 2 * cm
+HEADER_COLOR = colors.Color(0.533, 0.788, 0.482)
+
+# Font dan logo dimuat sekali per proses; registerFont bersifat global di ReportLab
+_logo = None
+_init_lock = threading.Lock()
+
+def init_app(app):
+    """Registers the report fonts and loads the logo once per process."""
+    global _logo
+    with _init_lock:
+        if _logo is not None:
+            return
+        font_dir = os.path.join(app.root_path, 'static', 'fonts', 'plusjakarta')
+        for name in REPORT_FONTS:
+            pdfmetrics.registerFont(TTFont(name, os.path.join(font_dir, f'{name}.ttf')))
+        with open(os.path.join(app.root_path, 'static', 'logo', 'rindang-logo-y.png'), 'rb') as f:
+            data = f.read()
+        width, height = ImageReader(io.BytesIO(data)).getSize()
+        _logo = (data, LOGO_HEIGHT * width / height)
+
+STYLES = {
+    'title': ParagraphStyle(name='Heading1', fontName='PlusJakartaSans-Bold', fontSize=22, leading=26, alignment=TA_CENTER),
+    'normal': ParagraphStyle(name='Normal', fontName='PlusJakartaSans-Regular', fontSize=12, leading=15),
+    'date': ParagraphStyle(name='Date', fontName='PlusJakartaSans-Italic', fontSize=10, alignment=TA_RIGHT, textColor=colors.gray),
+}
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), HEADER_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'PlusJakartaSans-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'PlusJakartaSans-Regular'),
+    ('FONTNAME', (0, -1), (-1, -1), 'PlusJakartaSans-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.Color(0, 0, 0, 0.25)),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+])
+
+def _kg(grams):
+    # Babel tidak bergantung pada locale.setlocale, jadi aman dipakai bersamaan di banyak greenthread
+    return f"{format_decimal((grams or 0) / 1000, format='#,##0.#', locale=REPORT_LOCALE)} kg"
+
+def harvest_rows(kebun_id):
+    """Harvested DataPangan rows of a garden as (komoditas, tanggal_panen, jml_panen), oldest first."""
+    return (
+        db.session.query(DataPangan.komoditas, DataPangan.tanggal_panen, DataPangan.jml_panen)
+        .filter(DataPangan.kebun_id == kebun_id, DataPangan.tanggal_panen.isnot(None))
+        .order_by(DataPangan.tanggal_panen, DataPangan.id)
+        .all()
+    )
+
+def garden_report(kebun, today=None):
+    """Builds the production PDF of one garden straight from its harvest rows.
+
+    Args:
+        kebun: Kebun to report on.
+        today (date): Date printed in the header; defaults to today.
+
+    Returns:
+        bytes: The PDF document.
+    """
+    if _logo is None:
+        raise RuntimeError('App.reports.init_app() belum dipanggil')
+    rows = harvest_rows(kebun.id)
+    today = today or date.today()
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, title=f'Laporan Produksi {kebun.nama}',
+                            topMargin=MARGIN, leftMargin=MARGIN, rightMargin=MARGIN, bottomMargin=MARGIN)
+    width = doc.width
+
+    logo_data, logo_width = _logo
+    logo = Image(io.BytesIO(logo_data), width=logo_width, height=LOGO_HEIGHT, hAlign='LEFT')
+    printed_on = Paragraph(format_date(today, format='full', locale=REPORT_LOCALE), STYLES['date'])
+    header = Table([[logo, printed_on]], colWidths=[logo_width, width - logo_width])
+    header.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'MIDDLE')]))
+
+    data = [['No.', 'Komoditas', 'Tanggal Panen', 'Jumlah Panen']]
+    total = 0
+    for number, (komoditas, tanggal_panen, jml_panen) in enumerate(rows, start=1):
+        data.append([number, komoditas, format_date(tanggal_panen, format='d MMM y', locale=REPORT_LOCALE), _kg(jml_panen)])
+        total += jml_panen or 0
+    data.append(['', 'Total', '', _kg(total)])
+
+    table = Table(data, colWidths=[width * share for share in (0.1, 0.3, 0.3, 0.3)], rowHeights=0.9 * cm,
+                  repeatRows=1, splitByRow=True, hAlign='CENTER', style=TABLE_STYLE)
+
+    luas = f"{format_decimal(kebun.luas_kebun, locale=REPORT_LOCALE)} ha" if kebun.luas_kebun else '-'
+    doc.build([
+        header,
+        Spacer(0, 15),
+        Paragraph('Laporan Produksi', STYLES['title']),
+        Spacer(0, 32),
+        Paragraph(f'Kebun: {escape(kebun.nama or "-")}', STYLES['normal']),
+        Spacer(0, 4),
+        Paragraph(f'Luas Kebun: {luas}', STYLES['normal']),
+        Spacer(0, 4),
+        Paragraph(f'Jumlah Data Panen: {len(rows)}', STYLES['normal']),
+        Spacer(0, 15),
+        table,
+    ])
+    return buffer.getvalue()
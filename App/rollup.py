@@ -0,0 +1,258 @@
+import math, click
+
+from datetime import date, datetime, timedelta
+from itertools import chain, groupby
+from flask.cli import AppGroup
+from sqlalchemy import event, inspect, select, insert, delete, literal_column, tuple_
+from sqlalchemy.orm import Session
+
+from App import db
+from App.models import DataPangan, Kebun, ProduksiHarian
+
+produksi_cli = AppGroup('produksi', help='Kelola rollup produksi harian.')
+
+REFRESH_CHUNK = 500
+
+# Kunci rollup dihitung di SQL sama persis dengan _key() di Python.
+# literal_column agar MySQL (ONLY_FULL_GROUP_BY) menganggap SELECT dan GROUP BY ekspresi yang sama.
+KEY_COLUMNS = (
+    db.func.coalesce(DataPangan.kebun_id, literal_column('0')),
+    DataPangan.komoditas,
+    db.func.coalesce(DataPangan.tanggal_panen, DataPangan.tanggal_bibit),
+)
+KEY_ATTRS = ('kebun_id', 'komoditas', 'tanggal_panen', 'tanggal_bibit')
+# Kolom yang memengaruhi isi rollup; UPDATE massal kolom lain tidak perlu dihitung ulang
+ROLLUP_ATTRS = set(KEY_ATTRS) | {'jml_panen', 'jml_bibit', 'is_deleted'}
+
+def _as_date(value):
+    # Form dan impor Excel kadang mengisi tanggal sebagai string atau 0
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def _key(kebun_id, komoditas, tanggal_panen, tanggal_bibit):
+    return (int(kebun_id or 0), komoditas, _as_date(tanggal_panen) or _as_date(tanggal_bibit))
+
+def _aggregate(where):
+    return (
+        select(
+            *KEY_COLUMNS,
+            db.func.sum(db.func.coalesce(DataPangan.jml_panen, 0)),
+            db.func.sum(DataPangan.jml_bibit),
+            db.func.count(),
+        )
+        .where(DataPangan.is_deleted.isnot(True), where)
+        .group_by(*KEY_COLUMNS)
+    )
+
+def _insert_from(query):
+    return insert(ProduksiHarian).from_select(
+        ['kebun_id', 'komoditas', 'tanggal', 'jml_panen', 'jml_bibit', 'jumlah_data'], query)
+
+def refresh_keys(session, keys):
+    """Recomputes the rollup rows for the given (kebun_id, komoditas, tanggal) keys."""
+    keys = sorted(key for key in keys if key[2] is not None)
+    rollup_key = tuple_(ProduksiHarian.kebun_id, ProduksiHarian.komoditas, ProduksiHarian.tanggal)
+    for start in range(0, len(keys), REFRESH_CHUNK):
+        chunk = keys[start:start + REFRESH_CHUNK]
+        session.execute(delete(ProduksiHarian).where(rollup_key.in_(chunk)))
+        session.execute(_insert_from(_aggregate(tuple_(*KEY_COLUMNS).in_(chunk))))
+
+def rebuild():
+    """Recomputes the whole rollup from DataPangan.
+
+    Returns:
+        int: Number of rollup rows written.
+    """
+    db.session.execute(delete(ProduksiHarian))
+    db.session.execute(_insert_from(_aggregate(db.true())))
+    db.session.commit()
+    return db.session.query(db.func.count(ProduksiHarian.id)).scalar()
+
+def _pending(session):
+    return session.info.setdefault('rollup_keys', set()), session.info.setdefault('rollup_ids', set())
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed(session, flush_context):
+    changed = [obj for obj in chain(session.new, session.dirty, session.deleted) if isinstance(obj, DataPangan)]
+    if not changed:
+        return
+    keys, _ = _pending(session)
+    for obj in changed:
+        state = inspect(obj)
+        current = [state.dict.get(attr) for attr in KEY_ATTRS]
+        keys.add(_key(*current))
+        # Nilai lama juga dihitung ulang jika kunci berubah (mis. tanggal_panen diisi)
+        previous = []
+        for attr, value in zip(KEY_ATTRS, current):
+            history = state.attrs[attr].history
+            previous.append(history.deleted[0] if history.deleted else value)
+        keys.add(_key(*previous))
+
+def _updates_rollup(statement, params):
+    if isinstance(params, list):
+        # UPDATE massal per primary key: kolom yang diubah ada di parameter tiap baris
+        return any(key in ROLLUP_ATTRS for row in params for key in row)
+    values = getattr(statement, '_values', None)
+    if not values:
+        # Nilai yang di-SET tidak diketahui, anggap menyentuh rollup
+        return True
+    return any(getattr(column, 'key', column) in ROLLUP_ATTRS for column in values)
+
+def _touches_production(session):
+    return any(isinstance(obj, DataPangan) for obj in chain(session.new, session.dirty, session.deleted))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    statement = orm_execute_state.statement
+    table = getattr(statement, 'table', None)
+    if table is None or table.name != DataPangan.__tablename__:
+        return
+
+    params = orm_execute_state.parameters
+    if orm_execute_state.is_update and not _updates_rollup(statement, params):
+        return
+
+    keys, ids = _pending(orm_execute_state.session)
+    if orm_execute_state.is_insert:
+        for row in params if isinstance(params, list) else [params or {}]:
+            keys.add(_key(*(row.get(attr) for attr in KEY_ATTRS)))
+        return
+
+    # Baris yang akan disentuh UPDATE/DELETE massal dibaca dulu sebelum statement dijalankan
+    if isinstance(params, list) and statement.whereclause is None:
+        where = DataPangan.id.in_([row['id'] for row in params if 'id' in row])
+    else:
+        where = statement.whereclause if statement.whereclause is not None else db.true()
+    affected = orm_execute_state.session.execute(select(DataPangan.id, *KEY_COLUMNS).where(where)).all()
+    for row in affected:
+        keys.add(tuple(row[1:]))
+        if orm_execute_state.is_update:
+            ids.add(row[0])
+
+@event.listens_for(Session, 'before_commit')
+def _apply_pending(session):
+    # Flush lebih awal hanya jika ada DataPangan yang berubah; commit lain tidak disentuh
+    if _touches_production(session):
+        session.flush()
+    if 'rollup_keys' not in session.info and 'rollup_ids' not in session.info:
+        return
+    keys = session.info.pop('rollup_keys', set())
+    ids = session.info.pop('rollup_ids', set())
+    if ids:
+        keys.update(tuple(row) for row in session.execute(select(*KEY_COLUMNS).where(DataPangan.id.in_(ids))))
+    if keys:
+        refresh_keys(session, keys)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('rollup_keys', None)
+    session.info.pop('rollup_ids', None)
+
+def production_summary():
+    """Returns totals for the admin dashboard read from the rollup.
+
+    Returns:
+        dict: total_panen, per_kebun {kebun_id: jml_panen} and
+        per_komoditas {komoditas: jml_panen}.
+    """
+    per_kebun = dict(
+        db.session.query(ProduksiHarian.kebun_id, db.func.sum(ProduksiHarian.jml_panen))
+        .group_by(ProduksiHarian.kebun_id)
+        .all()
+    )
+    per_komoditas = dict(
+        db.session.query(ProduksiHarian.komoditas, db.func.sum(ProduksiHarian.jml_panen))
+        .group_by(ProduksiHarian.komoditas)
+        .all()
+    )
+    return {
+        'total_panen': int(sum(per_kebun.values())),
+        'per_kebun': {kebun_id: int(total) for kebun_id, total in per_kebun.items()},
+        'per_komoditas': {komoditas: int(total) for komoditas, total in per_komoditas.items()},
+    }
+
+def downsample(tanggal, values, first, last, points):
+    """Sums daily values into at most `points` equal-width date buckets spanning first..last.
+
+    Buckets are aligned on `first` so series of different gardens share
+    the same x positions; each bucket is labelled with its first day.
+    """
+    width = max(1, math.ceil(((last - first).days + 1) / points))
+    buckets = {}
+    for day, value in zip(tanggal, values):
+        start = first + timedelta(days=(day - first).days // width * width)
+        buckets[start] = buckets.get(start, 0) + value
+    days = sorted(buckets)
+    return days, [buckets[day] for day in days]
+
+def chart_query(kebun_id=None, start=None, end=None):
+    """Rollup rows behind chart_series, in uq_produksi_harian order."""
+    query = (
+        db.session.query(ProduksiHarian.kebun_id, Kebun.nama, ProduksiHarian.komoditas,
+                         ProduksiHarian.tanggal, ProduksiHarian.jml_panen)
+        .join(Kebun, Kebun.id == ProduksiHarian.kebun_id)
+        .filter(ProduksiHarian.jml_panen > 0)
+        .order_by(ProduksiHarian.kebun_id, ProduksiHarian.komoditas, ProduksiHarian.tanggal)
+    )
+    if kebun_id is not None:
+        query = query.filter(ProduksiHarian.kebun_id == kebun_id)
+    if start is not None:
+        query = query.filter(ProduksiHarian.tanggal >= start)
+    if end is not None:
+        query = query.filter(ProduksiHarian.tanggal <= end)
+    return query
+
+def chart_series(kebun_id=None, start=None, end=None, points=None):
+    """Returns daily harvest series of every garden and commodity in one query.
+
+    Args:
+        kebun_id (int): Only this garden when given.
+        start, end (date): Optional inclusive date range.
+        points (int): If given, each series is downsampled to at most this
+            many buckets.
+
+    Returns:
+        list[dict]: Columnar series {kebun_id, kebun, komoditas, tanggal,
+        jml_panen}, ordered by garden and commodity.
+    """
+    rows = chart_query(kebun_id, start, end).all()
+    if not rows:
+        return []
+    first = start or min(row.tanggal for row in rows)
+    last = end or max(row.tanggal for row in rows)
+
+    series = []
+    for (kebun, nama, komoditas), group in groupby(rows, key=lambda row: (row.kebun_id, row.nama, row.komoditas)):
+        group = list(group)
+        tanggal = [row.tanggal for row in group]
+        jml_panen = [int(row.jml_panen) for row in group]
+        if points and len(tanggal) > points:
+            tanggal, jml_panen = downsample(tanggal, jml_panen, first, last, points)
+        series.append({
+            'kebun_id': kebun,
+            'kebun': nama,
+            'komoditas': komoditas,
+            'tanggal': [day.isoformat() for day in tanggal],
+            'jml_panen': jml_panen,
+        })
+    return series
+
+@produksi_cli.command('rebuild')
+@click.option('--jika-kosong', 'if_empty', is_flag=True, help='Lewati jika produksi_harian sudah berisi data.')
+def rebuild_command(if_empty):
+    """Hitung ulang tabel produksi_harian dari seluruh data_pangan."""
+    # Dipakai di fase release: deploy pertama mengisi rollup, deploy berikutnya tidak menghitung ulang
+    if if_empty and db.session.query(ProduksiHarian.id).first() is not None:
+        click.echo("produksi_harian sudah berisi data, rebuild dilewati.")
+        return
+    click.echo(f"{rebuild()} baris rollup produksi ditulis.")
@@ -1,5 +1,5 @@
-const API_URL = 'https://data.bmkg.go.id/DataMKG/MEWS/DigitalForecast/DigitalForecast-MalukuUtara.xml';
-const AREA_ID = '501394';
+// Prakiraan BMKG diambil dan diringkas oleh server, lihat App/weather.py
+const API_URL = '/api/weather';
 const DAYS_OF_WEEK = ['Minggu', 'Senin', 'Selasa', 'Rabu', 'Kamis', "Jum'at", 'Sabtu'];
 const WEATHER_DESCRIPTIONS = {
     0: ['Cerah', 'sunny'],
@@ -21,32 +21,31 @@ const WEATHER_DESCRIPTIONS = {
 async function fetchWeatherData() {
     try {
         const response = await fetch(API_URL);
-        const xmlString = await response.text();
-        const parser = new DOMParser();
-        const xmlDoc = parser.parseFromString(xmlString, 'text/xml');
-        return processWeatherData(xmlDoc);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        return processWeatherData(await response.json());
     } catch (error) {
-        console.error('Error fetching or parsing XML data:', error);
+        console.error('Error fetching weather data:', error);
         return null;
     }
 }
 
-function processWeatherData(xmlDoc) {
-    const area = xmlDoc.querySelector(`area[id="${AREA_ID}"]`);
+function processWeatherData(data) {
+    const area = data.data[0];
     if (!area) {
-        console.log(`Area dengan ID ${AREA_ID} tidak ditemukan.`);
+        console.log('Data prakiraan cuaca belum tersedia.');
         return null;
     }
 
-    const extractData = (paramId, unit) => {
-        return Array.from(area.querySelector(`parameter[id="${paramId}"]`).querySelectorAll('timerange')).map((timerange) => timerange.querySelector(`value[unit="${unit}"]`).textContent);
-    };
+    const forecasts = area.cuaca.flat();
+    const extractData = (field) => forecasts.map((forecast) => forecast[field]);
 
     return {
-        humidity: extractData('hu', '%'),
-        temperature: extractData('t', 'C'),
-        weather: extractData('weather', 'icon'),
-        windDirection: extractData('wd', 'deg'),
-        windSpeed: extractData('ws', 'Kt'),
+        humidity: extractData('hu'),
+        temperature: extractData('t'),
+        weather: extractData('weather'),
+        windDirection: extractData('wd'),
+        windSpeed: extractData('ws'),
     };
 }
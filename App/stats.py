@@ -0,0 +1,146 @@
+import os, threading, time
+
+from datetime import date, datetime, timedelta
+
+from App import db
+from App.cache import TTLCache, on_commit, spawn
+from App.models import Kebun, DataPangan, Job
+
+# Dibuang setiap ada commit yang menyentuh kebun/data_pangan; TTL hanya sebagai pengaman
+LANDING_STATS_TTL = int(os.environ.get('LANDING_STATS_TTL', 10 * 60))
+FARMER_STATS_TTL = int(os.environ.get('FARMER_STATS_TTL', 10 * 60))
+
+landing_cache = TTLCache(ttl=LANDING_STATS_TTL, maxsize=1, name='landing')
+farmer_cache = TTLCache(ttl=FARMER_STATS_TTL, maxsize=2048, name='petani')
+
+# Job yang menulis data_pangan di proses worker. on_commit di worker hanya membuang cache
+# worker itu sendiri; proses web menyusul lewat job yang selesai, dibaca di latar belakang
+# paling sering sekali per STATS_SYNC_INTERVAL, bukan di setiap request.
+DATA_JOB_KINDS = ('import_pangan',)
+STATS_SYNC_INTERVAL = int(os.environ.get('STATS_SYNC_INTERVAL', 30))
+
+_sync_lock = threading.Lock()
+_synced_at = datetime.now()
+_next_sync = 0
+
+def sync_finished_jobs():
+    """Drops the stats cached before a data-writing job finished in another process."""
+    global _synced_at
+    started = datetime.now()
+    # Tumpang tindih satu interval agar job yang selesai saat sinkronisasi tetap terbaca
+    since = _synced_at - timedelta(seconds=STATS_SYNC_INTERVAL)
+    users = {
+        user_id for user_id, in db.session.query(Job.created_by)
+        .filter(Job.kind.in_(DATA_JOB_KINDS), Job.finished_at > since)
+    }
+    _synced_at = started
+    if users:
+        landing_cache.clear()
+        for user_id in users:
+            farmer_cache.delete(user_id)
+
+def _sync_finished_jobs_once():
+    try:
+        sync_finished_jobs()
+    finally:
+        _sync_lock.release()
+
+def _schedule_sync():
+    global _next_sync
+    if time.monotonic() >= _next_sync and _sync_lock.acquire(blocking=False):
+        _next_sync = time.monotonic() + STATS_SYNC_INTERVAL
+        spawn(_sync_finished_jobs_once)
+
+def _load_landing_stats():
+    jml_kebun = db.session.query(db.func.count(Kebun.id)).scalar()
+    total_panen = db.session.query(db.func.coalesce(db.func.sum(DataPangan.jml_panen), 0)).scalar()
+    return {'kebun': jml_kebun, 'produksi': int(total_panen)}
+
+def landing_stats():
+    """Returns the garden count and total harvest shown on the homepage.
+
+    Both are computed with SQL aggregates and cached until the next commit
+    that writes to Kebun or DataPangan; import jobs finished by the worker
+    are picked up within STATS_SYNC_INTERVAL.
+    """
+    _schedule_sync()
+    return landing_cache.get_or_load('landing', _load_landing_stats)
+
+def farmer_rows_query(user_id):
+    # Urutan index ix_data_pangan_user_komoditas_bibit (id sebagai akhiran PK), tanpa filesort
+    return (
+        db.session.query(DataPangan.id, DataPangan.komoditas, DataPangan.tanggal_panen,
+                         DataPangan.estimasi_panen, DataPangan.jml_panen)
+        .filter(DataPangan.user_id == user_id)
+        .order_by(DataPangan.komoditas, DataPangan.tanggal_bibit, DataPangan.id)
+    )
+
+def summarize_farmer_rows(rows):
+    """Builds the farmer stats from (id, komoditas, tanggal_panen, estimasi_panen, jml_panen) rows.
+
+    rows must be ordered by komoditas, tanggal_bibit and id. Every row is
+    one point of its commodity's series, newest tanggal_bibit first, like
+    the per-row lists the pages used to build.
+    """
+    komoditas = {}
+    estimasi = set()
+    for _, nama, tanggal_panen, estimasi_panen, jml_panen in reversed(rows):
+        item = komoditas.setdefault(nama, {'total_panen': 0, 'jml_panen': [], 'tgl_panen': []})
+        item['total_panen'] += int(jml_panen or 0)
+        item['jml_panen'].append(int(jml_panen or 0))
+        item['tgl_panen'].append(tanggal_panen.isoformat() if tanggal_panen else None)
+        if estimasi_panen:
+            estimasi.add(estimasi_panen)
+
+    return {
+        'total_panen': sum(item['total_panen'] for item in komoditas.values()),
+        'jumlah_data': len(rows),
+        'komoditas': komoditas,
+        'estimasi_panen': sorted(estimasi),
+    }
+
+def _load_farmer_stats(user_id):
+    return summarize_farmer_rows(farmer_rows_query(user_id).all())
+
+def farmer_stats(user_id):
+    """Returns one farmer's production stats from a single indexed query.
+
+    Returns:
+        dict: total_panen, jumlah_data, estimasi_panen (sorted dates) and
+        komoditas {nama: {total_panen, jml_panen, tgl_panen}}, where the
+        series hold one point per row, newest tanggal_bibit first. Cached per user
+        until the next commit touching that user's DataPangan rows, or
+        within STATS_SYNC_INTERVAL of one of the user's import jobs finishing.
+    """
+    _schedule_sync()
+    return farmer_cache.get_or_load(user_id, lambda: _load_farmer_stats(user_id))
+
+def commodity_stats(stats, nama):
+    return stats['komoditas'].get(nama, {'total_panen': 0, 'jml_panen': [], 'tgl_panen': []})
+
+def increase(series):
+    """Percentage change between the last two values of a series, 0 if unknown."""
+    if len(series) < 2 or 0 in series:
+        return 0
+    return round(((series[-1] - series[-2]) / series[-2]) * 100)
+
+def harvest_countdown(stats, today=None):
+    """Returns ([{date, days_remaining}], days until the next upcoming harvest or None)."""
+    today = today or date.today()
+    harvest_data = [
+        {'date': estimasi.isoformat(), 'days_remaining': (estimasi - today).days}
+        for estimasi in stats['estimasi_panen']
+    ]
+    upcoming = [item['days_remaining'] for item in harvest_data if item['days_remaining'] > 0]
+    return harvest_data, min(upcoming) if upcoming else None
+
+def _invalidate_farmers(changes):
+    for model, values in changes:
+        if values is None or 'user_id' not in values:
+            # Statement massal (atau atribut tidak termuat): pengguna yang terdampak tidak diketahui
+            farmer_cache.clear()
+            return
+        farmer_cache.delete(values.get('user_id'))
+
+on_commit((Kebun, DataPangan), lambda changes: landing_cache.clear())
+on_commit((DataPangan,), _invalidate_farmers)
@@ -0,0 +1,143 @@
+import math, os, threading, time
+
+from collections import OrderedDict
+from flask import jsonify
+from flask_login import current_user
+from flask_limiter.util import get_remote_address
+
+class Rejected(Exception):
+    """Raised when a request is refused by admission control."""
+
+    def __init__(self, status, message, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+    def response(self):
+        response = jsonify({'error': self.message})
+        response.status_code = self.status
+        response.headers['Retry-After'] = str(max(1, math.ceil(self.retry_after)))
+        return response
+
+class TokenBuckets:
+    """Per-key token buckets refilled at `rate` tokens per second up to `capacity`.
+
+    Only the `maxsize` most recently seen keys are remembered; a forgotten key
+    simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate, capacity, maxsize=10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Takes one token for key.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            return wait
+
+class ConcurrencyGate:
+    """Caps concurrent work and lets a bounded number of callers wait for a slot."""
+
+    def __init__(self, limit, queue_size, queue_timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Takes a slot, waiting up to queue_timeout in the queue.
+
+        Raises:
+            Rejected: With status 503 if the queue is full or the wait times out.
+        """
+        with self._cond:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return
+            if self.waiting >= self.queue_size:
+                self.rejected += 1
+                raise Rejected(503, 'Asisten sedang sibuk, silakan coba beberapa saat lagi.', self.queue_timeout)
+
+            self.waiting += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise Rejected(503, 'Asisten sedang sibuk, silakan coba beberapa saat lagi.', self.queue_timeout)
+                    self._cond.wait(remaining)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+class Admission:
+    """Admission control for an expensive endpoint.
+
+    Requests first spend a token from the caller's user bucket (when logged
+    in) and IP bucket, getting 429 when either is empty, then take a slot
+    from the shared ConcurrencyGate, getting 503 when the queue is full.
+    Every successful enter() must be paired with exit().
+    """
+
+    def __init__(self, max_concurrency, queue_size, queue_timeout, per_user_rate, per_user_burst, per_ip_rate, per_ip_burst):
+        self.gate = ConcurrencyGate(max_concurrency, queue_size, queue_timeout)
+        self.user_buckets = TokenBuckets(per_user_rate, per_user_burst)
+        self.ip_buckets = TokenBuckets(per_ip_rate, per_ip_burst)
+
+    def enter(self):
+        if current_user.is_authenticated:
+            wait = self.user_buckets.take(current_user.get_id())
+            if wait:
+                raise Rejected(429, 'Terlalu banyak pertanyaan, silakan tunggu sebentar.', wait)
+        wait = self.ip_buckets.take(get_remote_address())
+        if wait:
+            raise Rejected(429, 'Terlalu banyak pertanyaan, silakan tunggu sebentar.', wait)
+        self.gate.acquire()
+
+    def exit(self):
+        self.gate.release()
+
+    def stats(self):
+        return {
+            'active': self.gate.active,
+            'waiting': self.gate.waiting,
+            'rejected': self.gate.rejected,
+        }
+
+assistant_admission = Admission(
+    max_concurrency=int(os.environ.get('ASSISTANT_MAX_CONCURRENCY', 4)),
+    queue_size=int(os.environ.get('ASSISTANT_QUEUE_SIZE', 8)),
+    queue_timeout=float(os.environ.get('ASSISTANT_QUEUE_TIMEOUT', 10)),
+    per_user_rate=float(os.environ.get('ASSISTANT_USER_PER_MINUTE', 10)) / 60,
+    per_user_burst=int(os.environ.get('ASSISTANT_USER_BURST', 5)),
+    per_ip_rate=float(os.environ.get('ASSISTANT_IP_PER_MINUTE', 20)) / 60,
+    per_ip_burst=int(os.environ.get('ASSISTANT_IP_BURST', 10)),
+)
@@ -1,3 +1,5 @@
+import random, string
+
 from itsdangerous import URLSafeTimedSerializer
 from flask_socketio import emit
 from flask_mail import Message
@@ -23,6 +25,49 @@ def confirm_token(token, expiration=3600):
         return False
     return email
 
+def generate_unique_id(prefix="KR_", string_length=2, number_length=4):
+    """
+    Generates a unique ID in the format KR_AB1234.
+
+    Args:
+        prefix: The static identifier prefix (default: "KR_").
+        string_length: The length of the random string part (default: 2).
+        number_length: The length of the random number part (default: 4).
+
+    Returns:
+        A unique ID string.
+    """
+    random_string = ''.join(random.choices(string.ascii_uppercase, k=string_length))
+    random_number = ''.join(random.choices(string.digits, k=number_length))
+    unique_id = f"{prefix}{random_string}{random_number}"
+    return unique_id
+
+def parse_koordinat(value):
+    """Parses a Kebun.koordinat string into a (latitude, longitude) tuple.
+
+    Coordinates are stored as "longitude, latitude", the order the Mapbox
+    picker writes them in.
+
+    Args:
+        value: The stored coordinate string, e.g. "127.365400, 0.790200".
+
+    Returns:
+        A (latitude, longitude) tuple of floats, or None if the value is empty
+        or not a valid coordinate pair.
+    """
+    if not value:
+        return None
+    parts = str(value).replace(';', ',').split(',')
+    if len(parts) != 2:
+        return None
+    try:
+        longitude, latitude = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
 def send_password_reset_email(user):
     # Sends an email with a link to reset the user's password.
     token = user.get_reset_password_token()
@@ -1,6 +1,6 @@
-import json, requests, secrets, os, random, string, markdown2, google.generativeai as genai, smtplib
+import json, requests, secrets, os, random, string, google.generativeai as genai, smtplib
 
-from flask import Blueprint, current_app, request, render_template, flash, redirect, url_for, send_from_directory, jsonify
+from flask import Blueprint, abort, current_app, request, render_template, flash, redirect, url_for, send_from_directory, send_file, jsonify, Response, stream_with_context
 from flask_admin.base import expose, AdminIndexView, Admin
 from flask_login import login_required, current_user
 from flask_mail import Message
@@ -14,7 +14,23 @@ from functools import wraps
 from textwrap import shorten
 from dotenv import load_dotenv
 
-from App.models import User, DataPangan, Forum, Kebun, Artikel
+from App.models import User, DataPangan, Forum, Kebun, Artikel, Job
+from App.utils import generate_unique_id
+from App.prices import get_price_range
+from App.stats import landing_stats, farmer_stats, commodity_stats, increase, harvest_countdown
+from App.pagination import keyset_paginate
+from App import queries
+from App.replica import read_replica
+from App import archive
+from App import jobs
+from App.importer import import_gardens
+from App.export import export_response, request_filters
+from App.regions import get_document, CACHE_MAX_AGE as REGION_CACHE_MAX_AGE
+from App.weather import get_forecast_document, garden_forecasts
+from App.assistant import AssistantError
+from App.avatars import avatar_file, normalize_size, AVATAR_MAX_AGE, GUEST_AVATAR_MAX_AGE
+from App import assistant
+from App.throttle import assistant_admission, Rejected
 from App import db, flatpages, mail
 
 load_dotenv()
@@ -39,23 +55,6 @@ def report_allowed_file(filename):
     return '.' in filename and \
             filename.rsplit('.', 1)[1].lower() in REPORT_ALLOWED_EXTENSIONS
 
-def generate_unique_id(prefix="KR_", string_length=2, number_length=4):
-    """
-    Generates a unique ID in the format KR_AB1234.
-
-    Args:
-        prefix: The static identifier prefix (default: "KR_").
-        string_length: The length of the random string part (default: 2).
-        number_length: The length of the random number part (default: 4).
-
-    Returns:
-        A unique ID string.
-    """
-    random_string = ''.join(random.choices(string.ascii_uppercase, k=string_length))
-    random_number = ''.join(random.choices(string.digits, k=number_length))
-    unique_id = f"{prefix}{random_string}{random_number}"
-    return unique_id
-
 def generate_username(email):
     """Generate a username from the email address."""
     username_base = email.split('@')[0]
@@ -90,13 +89,8 @@ def fetch_price_data(start_date, end_date):
         list: A list of dictionaries containing formatted price data.
     """
 
-    url = f"https://panelharga.badanpangan.go.id/data/kabkota-range-by-levelharga/{KAB_KOTA}/{KOMODITAS_ID}/{start_date}/{end_date}"
-
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-
-        data = response.json()
+        data = get_price_range(KAB_KOTA, KOMODITAS_ID, start_date, end_date)
 
         table_data = []
         for item in data["data"]:
@@ -117,7 +111,7 @@ def fetch_price_data(start_date, end_date):
 
         return table_data
 
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, ValueError) as e:
         flash(f"Error fetching data: {e}", category='error')
         return []  # Return an empty list on error
     
@@ -127,35 +121,68 @@ def gemini_api():
     if not user_message:
         return jsonify({'error': 'Message is required'}), 400
 
-    prompt = f"Saya adalah asisten virtual untuk platform agrikultur digital bernama RINDANG, yang membantu petani mengelola produksi pertanian dan memberikan informasi seputar pertanian di Kota Ternate. Saya hanya boleh memberikan jawaban terkait agrikultur, termasuk tetapi tidak terbatas pada: cara merawat tanaman, rekomendasi pupuk, langkah-langkah menghadapi cuaca, dan teknologi pertanian. Pertanyaan pengguna: {user_message}."
+    # Jawaban yang sudah tersimpan tidak memakai kuota maupun slot antrean
+    assistant_reply = assistant.cached_reply(user_message)
+    if assistant_reply is not None:
+        return jsonify({'reply': assistant_reply}), 200
 
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(prompt)
-        
-        if response and response.text:
-            # Convert Markdown to HTML in the backend using markdown2
-            assistant_reply = markdown2.markdown(response.text)
-        else:
-            return jsonify({'error': 'No content received from Gemini API'}), 500
+        assistant_admission.enter()
+    except Rejected as e:
+        return e.response()
 
+    try:
+        assistant_reply = assistant.ask(user_message)
         return jsonify({'reply': assistant_reply}), 200
 
+    except AssistantError as e:
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         print(f"Error communicating with Gemini API: {e}")
         return jsonify({'error': f'Error communicating with Gemini API: {e}'}), 500
+    finally:
+        assistant_admission.exit()
+
+@views.route('/api/gemini/stream', methods=['POST'])
+def gemini_stream_api():
+    user_message = request.json.get('message')
+    if not user_message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    assistant_reply = assistant.cached_reply(user_message)
+    if assistant_reply is not None:
+        return Response(sse('done', {'reply': assistant_reply}), mimetype='text/event-stream')
+
+    try:
+        assistant_admission.enter()
+    except Rejected as e:
+        return e.response()
+
+    def generate():
+        try:
+            for event, html in assistant.stream(user_message):
+                yield sse(event, {'reply': html})
+        except Exception as e:
+            print(f"Error communicating with Gemini API: {e}")
+            yield sse('error', {'error': f'Error communicating with Gemini API: {e}'})
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Slot dilepas setelah stream selesai dikirim, bukan saat view return
+    response.call_on_close(assistant_admission.exit)
+    return response
 
 @views.route('/virtual-assistant')
 def virtual_assistant():
     return render_template('features/virtual_assistant.html')
 
 @views.route('/', methods=['GET'])
+@read_replica
 def index():
-    kebun = Kebun.query.all()
-    produksi = DataPangan.query.all()
-
-    jml_kebun = len(kebun)
-    total_panen = sum(prod.jml_panen for prod in produksi)
+    stats = landing_stats()
 
     # Calculate date range for the API
     today = datetime.today()
@@ -164,13 +191,14 @@ def index():
     end_date = today.strftime("%Y-%m-%d")
 
     return render_template('index.html', 
-                            kebun=jml_kebun,
+                            kebun=stats['kebun'],
                             round=round, 
-                            produksi=total_panen, 
+                            produksi=stats['produksi'], 
                             start_date=start_date, 
                             end_date=end_date)
 
 @views.route('/api/get-price-data', methods=['GET'])
+@read_replica
 def getpricedata():
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
@@ -185,18 +213,28 @@ def getpricedata():
     return jsonify(table_data)
 
 @views.route('api/price-data', methods=['GET', 'POST'])
+@read_replica
 def get_price_data():
-    kab_kota = request.args.get('kab_kota')
-    komoditas_id = request.args.get('komoditas_id')
+    # type=int diam-diam memakai default untuk nilai yang bukan angka, jadi dicek di sini
+    kab_kota = request.args.get('kab_kota', type=int)
+    komoditas_id = request.args.get('komoditas_id', type=int)
+    if ('kab_kota' in request.args and kab_kota is None) or ('komoditas_id' in request.args and komoditas_id is None):
+        return jsonify({"error": "kab_kota dan komoditas_id harus berupa angka"}), 400
+    kab_kota = KAB_KOTA if kab_kota is None else kab_kota
+    komoditas_id = KOMODITAS_ID if komoditas_id is None else komoditas_id
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
 
-    url = f"https://panelharga.badanpangan.go.id/data/kabkota-range-by-levelharga/{KAB_KOTA}/{KOMODITAS_ID}/{start_date}/{end_date}"
-    
+    if not start_date or not end_date:
+        today = datetime.today()
+        one_week_ago = today - timedelta(days=7)
+        start_date = one_week_ago.strftime("%Y-%m-%d")
+        end_date = today.strftime("%Y-%m-%d")
+
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an error for bad responses
-        return jsonify(response.json()), 200
+        return jsonify(get_price_range(kab_kota, komoditas_id, start_date, end_date)), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except requests.exceptions.RequestException as e:
         return jsonify({"error": str(e)}), 500
 
@@ -206,19 +244,11 @@ def personal():
     users = User.query.filter_by(id=current_user.id)
 
     pagination_pages = 5
-    page = request.args.get('page', 1, type=int)
-    articles_pagination = Artikel.query.paginate(page=page, per_page=pagination_pages) #<-- MOVE THIS LINE OUT OF IF BLOCK!
-    forum_pagination = Forum.query.paginate(page=page, per_page=pagination_pages) #<-- MOVE THIS LINE OUT OF IF BLOCK!
+    articles_pagination = keyset_paginate(queries.article_list(), Artikel.id, cursor=request.args.get('artikel'), per_page=pagination_pages)
+    forum_pagination = keyset_paginate(queries.question_list(), Forum.id, cursor=request.args.get('forum'), per_page=pagination_pages)
 
-    if not articles_pagination.items: #Check if articles exist on the CURRENT page
-        articles = []  # If not any article found for the page assign an empty array and handle no data condition at template
-    else:
-        articles = articles_pagination.items
-
-    if not forum_pagination.items: #Check if articles exist on the CURRENT page
-        forum = []  # If not any article found for the page assign an empty array and handle no data condition at template
-    else:
-        forum = forum_pagination.items
+    articles = articles_pagination.items
+    forum = forum_pagination.items
 
     return render_template('personal/index.html', users=users, articles=articles, forum=forum, min=min, max=max, articles_pagination=articles_pagination, forum_pagination=forum_pagination)
 
@@ -242,7 +272,7 @@ def read_article(id):
 @views.route('/write_article', methods=['GET', 'POST'])
 @login_required
 def write_article():
-    articles = Artikel.query.filter_by(created_by=current_user.id)
+    articles = queries.author_articles(current_user.id)
 
     if request.method == 'POST':
         judul = request.form['judul']
@@ -293,31 +323,19 @@ def dashboard():
     if current_user.role == 'admin':
         return redirect(url_for('admin_page.index'))
 
-    data_pangan = DataPangan.query.filter_by(user_id=current_user.id).all()
-    total_panen = sum(prod.jml_panen for prod in data_pangan if data_pangan)
+    stats = farmer_stats(current_user.id)
+    total_panen = stats['total_panen']
+    harvest_data, next_harvest_days = harvest_countdown(stats)
 
-    today = date.today()
-    harvest_data = []
-    next_harvest_days = None
-
-    for estPanen in data_pangan:
-        if estPanen.estimasi_panen:
-            est_date = datetime.strptime(estPanen.estimasi_panen, '%Y-%m-%d').date()
-            days_remaining = (est_date - today).days
-            harvest_data.append({
-                'date': estPanen.estimasi_panen,
-                'days_remaining': days_remaining
-            })
-
-            # Update next_harvest_days if this is the soonest upcoming harvest
-            if days_remaining > 0 and (next_harvest_days is None or days_remaining < next_harvest_days):
-                next_harvest_days = days_remaining
+    kebun = queries.user_gardens(current_user.id).all()
 
     return render_template('dashboard/index.html', 
                             total_panen=total_panen, 
                             round=round, 
                             harvest_data=json.dumps(harvest_data),
-                            next_harvest_days=next_harvest_days
+                            next_harvest_days=next_harvest_days,
+                            kebun=kebun,
+                            cuaca_kebun=garden_forecasts(kebun)
                             )
 
 @views.route('/dashboard/penjualan')
@@ -355,59 +373,28 @@ def dataproduksi():
         return redirect(url_for('admin_page.index'))
 
     user_data = User.query.filter_by(id=current_user.id).first()
-    pangan = DataPangan.query.filter_by(user_id=current_user.id).all()
     kebun = Kebun.query.filter_by(user_id=current_user.id).all()
 
-    page = request.args.get('page', 1, type=int)
     per_page = 5
 
     sort_by = request.args.get('sort_by', 'tanggal_panen')
     sort_order = request.args.get('sort_order', 'desc')
 
-    # Define a dictionary to map sort_by values to column names
-    sort_columns = {
-        'kebun': DataPangan.kebun_id,
-        'bibit': DataPangan.jml_bibit,
-        'tanam': DataPangan.tanggal_bibit,
-        'status': DataPangan.status,
-        'hasil': DataPangan.jml_panen
-    }
-
     # Get the column to sort by
-    sort_column = sort_columns.get(sort_by, DataPangan.tanggal_panen)
-
-    # Apply the sorting
-    if sort_order == 'asc':
-        cabai = DataPangan.query.filter_by(user_id=current_user.id, komoditas='Cabai').order_by(sort_column.asc())
-        tomat = DataPangan.query.filter_by(user_id=current_user.id, komoditas='Tomat').order_by(sort_column.asc())
-    else:
-        cabai = DataPangan.query.filter_by(user_id=current_user.id, komoditas='Cabai').order_by(sort_column.desc())
-        tomat = DataPangan.query.filter_by(user_id=current_user.id, komoditas='Tomat').order_by(sort_column.desc())
+    sort_column = queries.PRODUCTION_SORT_COLUMNS.get(sort_by, queries.PRODUCTION_DEFAULT_SORT)
 
-    cabai = cabai.paginate(page=page, per_page=per_page, error_out=False)
-    tomat = tomat.paginate(page=page, per_page=per_page, error_out=False)
+    # Keyset pagination per komoditas; cursor masing-masing tabel dibawa di ?cabai= dan ?tomat=
+    cabai = keyset_paginate(queries.production(current_user.id, 'Cabai'), sort_column,
+                            descending=sort_order != 'asc', cursor=request.args.get('cabai'), per_page=per_page, total='approx')
+    tomat = keyset_paginate(queries.production(current_user.id, 'Tomat'), sort_column,
+                            descending=sort_order != 'asc', cursor=request.args.get('tomat'), per_page=per_page, total='approx')
     
-    # Menggunakan list comprehension untuk menyederhanakan perhitungan total panen
-    total_panen = [total.jml_panen for total in pangan]
-
-    allDataCabai = DataPangan.query.filter_by(user_id=current_user.id, komoditas='Cabai').order_by(desc(DataPangan.tanggal_bibit)).all()
-    allDataTomat = DataPangan.query.filter_by(user_id=current_user.id, komoditas='Tomat').order_by(desc(DataPangan.tanggal_bibit)).all()
-
-    # Menggunakan list comprehension untuk menyederhanakan pembuatan list data statistik
-    stat_cabai = [panenCabai.jml_panen for panenCabai in allDataCabai]
-    tgl_panen_cabai = [panenCabai.tanggal_panen for panenCabai in allDataCabai]
-    stat_tomat = [panenTomat.jml_panen for panenTomat in allDataTomat]
-    tgl_panen_tomat = [panenTomat.tanggal_panen for panenTomat in allDataTomat]
-
-    # Helper function to calculate percentage increase
-    def calc_increase(data):
-        if len(data) < 2 or 0 in data:
-            return 0
-        return round(((data[-1] - data[-2])/data[-2])*100)
-
-    total_of_panen = sum(total_panen)
-    totalPanenCabai = sum(stat_cabai)
-    totalPanenTomat = sum(stat_tomat)
+    # Ringkasan dihitung sekali per petani dan di-cache sampai datanya berubah
+    stats = farmer_stats(current_user.id)
+    stat_cabai = commodity_stats(stats, 'Cabai')
+    stat_tomat = commodity_stats(stats, 'Tomat')
+    # Modal ubah/hapus hanya dibutuhkan untuk baris yang tampil di halaman ini
+    pangan = cabai.items + tomat.items
 
     if request.method == 'POST':
         kebun = request.form['kebun']
@@ -430,17 +417,17 @@ def dataproduksi():
 
     return render_template('dashboard/data-pangan.html', 
                             max=max, min=min, 
-                            allDataCabai=allDataCabai, allDataTomat=allDataTomat, 
                             kebun=kebun, user_data=user_data, 
-                            kenaikan_cabai=calc_increase(stat_cabai), 
-                            kenaikan_tomat=calc_increase(stat_tomat), 
-                            stat_cabai=stat_cabai, stat_tomat=stat_tomat, 
+                            kenaikan_cabai=increase(stat_cabai['jml_panen']), 
+                            kenaikan_tomat=increase(stat_tomat['jml_panen']), 
+                            stat_cabai=json.dumps(stat_cabai['jml_panen']), stat_tomat=json.dumps(stat_tomat['jml_panen']), 
                             cabai=cabai, tomat=tomat, pangan=pangan, 
-                            total_panen=total_of_panen, 
-                            totalPanenCabai=totalPanenCabai, 
-                            totalPanenTomat=totalPanenTomat, 
-                            tgl_panen_cabai=json.dumps(tgl_panen_cabai), 
-                            tgl_panen_tomat=json.dumps(tgl_panen_tomat),
+                            jumlah_data=stats['jumlah_data'], 
+                            total_panen=stats['total_panen'], 
+                            totalPanenCabai=stat_cabai['total_panen'], 
+                            totalPanenTomat=stat_tomat['total_panen'], 
+                            tgl_panen_cabai=json.dumps(stat_cabai['tgl_panen']), 
+                            tgl_panen_tomat=json.dumps(stat_tomat['tgl_panen']),
                             sort_by=sort_by, sort_order=sort_order)
 
 @views.route('/dashboard/data-pangan/import', methods=['GET', 'POST'])
@@ -449,8 +436,6 @@ def import_data_pangan():
     if current_user.role == 'admin':
         return redirect(url_for('admin_page.index'))
     
-    from openpyxl import load_workbook
-
     if request.method == 'POST':
         import_type = request.form['import_type']
         excel_file = request.files['excel_file'] 
@@ -463,49 +448,27 @@ def import_data_pangan():
             flash('Tidak ada file yang dipilih!', 'error')
             return redirect(request.url)
 
+        if import_type not in ('penanaman', 'panen'):
+            flash('Tipe impor tidak valid!', 'error')
+            return redirect(url_for('views.import_data_pangan'))
+
         # Validasi ekstensi dan nama file
         if excel_file and report_allowed_file(excel_file.filename):
             if not allowed_report_stat(excel_file.filename, import_type):
                 flash('Nama file harus sesuai format ("panen" atau "penanaman") dan sesuai dengan pilihan status produksi!', 'warning')
                 return redirect(request.url)
 
-            filename = secure_filename(excel_file.filename)
-            
-            try: 
-                wb = load_workbook(excel_file)
-                sheet = wb.active
-
-                for row in sheet.iter_rows(min_row=2):
-                    kebun = row[0].value
-                    komoditas = row[1].value
-                    jml_bibit = row[2].value
-                    tanggal_bibit = row[3].value.strftime('%Y-%m-%d') if isinstance(row[3].value, datetime) else row[3].value 
-
-                    # Menyederhanakan pembuatan objek DataPangan berdasarkan tipe impor
-                    if import_type == 'penanaman':
-                        data_pangan = DataPangan(kebun=kebun, komoditas=komoditas, 
-                                                jml_bibit=jml_bibit, tanggal_bibit=tanggal_bibit, 
-                                                status='Penanaman', jml_panen=0, tanggal_panen=0, 
-                                                user_id=current_user.id, kelurahan_id=current_user.kelurahan_id)
-                    elif import_type == 'panen':
-                        jml_panen = row[4].value 
-                        tanggal_panen = row[5].value.strftime('%Y-%m-%d') if isinstance(row[5].value, datetime) else row[5].value
-
-                        data_pangan = DataPangan(kebun=kebun, komoditas=komoditas, 
-                                                jml_bibit=jml_bibit, tanggal_bibit=tanggal_bibit, 
-                                                status='Panen', jml_panen=jml_panen, tanggal_panen=tanggal_panen, 
-                                                user_id=current_user.id, kelurahan_id=current_user.kelurahan_id)
-                    else:
-                        flash('Tipe impor tidak valid!', 'error')
-                        return redirect(url_for('views.import_data_pangan'))
-                    db.session.add(data_pangan)
-        
-                db.session.commit()
-                flash('Data berhasil diimpor!', 'success')
-                return redirect(url_for('views.dataproduksi'))
-            except Exception as e:
-                flash(f'Terjadi kesalahan saat memproses file: {e}', 'error')
-                return redirect(request.url)
+            # File diproses oleh `flask jobs worker`; request langsung selesai dengan id job
+            # File disimpan di database agar worker di host/container lain bisa membacanya
+            upload_id = jobs.store_upload(secure_filename(excel_file.filename), excel_file.read())
+            # Tidak diulang otomatis karena chunk yang sudah tersimpan akan terimpor dua kali
+            job = jobs.enqueue('import_pangan', {'upload_id': upload_id, 'import_type': import_type, 'user_id': current_user.id},
+                               user_id=current_user.id, max_attempts=1)
+
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({"job_id": job.id, "status_url": url_for('views.job_status_api', id=job.id)}), 202
+            flash(f'File sedang diimpor (job #{job.id}). Data akan muncul setelah proses selesai.', 'info')
+            return redirect(url_for('views.dataproduksi'))
         else:
             flash('Ekstensi file tidak diizinkan. Unggah file Excel (.xlsx)!', 'error')
             return redirect(request.url) 
@@ -518,7 +481,9 @@ def delete_selected_data_pangan():
     delete_ids = request.form.getlist('delete_ids')  # Get list of selected IDs
 
     if delete_ids:
-        DataPangan.query.filter(DataPangan.id.in_(delete_ids)).delete(synchronize_session=False)
+        # Hapus lunak; baris dipindahkan ke arsip oleh `flask arsip jalankan`
+        DataPangan.query.filter(DataPangan.id.in_(delete_ids), DataPangan.user_id == current_user.id) \
+            .update({DataPangan.is_deleted: True}, synchronize_session=False)
         db.session.commit()
         flash('Data yang dipilih berhasil dihapus!', 'warning')
     else:
@@ -563,10 +528,49 @@ def updatepangan(id):
 @login_required
 def delete_data_pangan(id):
     data = DataPangan.query.get_or_404(id)
-    db.session.delete(data)
+    data.is_deleted = True
     db.session.commit()
     return redirect(url_for('views.dataproduksi'))
 
+@views.route('/dashboard/export/<string:dataset>', methods=['GET'])
+@read_replica
+@login_required
+def export_data(dataset):
+    # Petani hanya dapat mengekspor data miliknya sendiri
+    if dataset not in ('data-pangan', 'kebun'):
+        abort(404)
+    response = export_response(dataset, request.args.get('format', 'csv'), request_filters(user_id=current_user.id))
+    if response is None:
+        abort(404)
+    return response
+
+@views.route('/api/jobs/<int:id>', methods=['GET'])
+@login_required
+def job_status_api(id):
+    job = db.session.get(Job, id)
+    if job is None or (job.created_by != current_user.id and current_user.role != 'admin'):
+        return jsonify({"error": "Job tidak ditemukan"}), 404
+    return jsonify(jobs.job_status(job))
+
+@views.route('/api/sampah/<string:jenis>', methods=['GET'])
+@login_required
+def trash_api(jenis):
+    model = archive.TRASH_KINDS.get(jenis)
+    if model is None:
+        return jsonify({"error": "Jenis data tidak dikenal"}), 404
+    return jsonify({"items": archive.trash(model, current_user.id)})
+
+@views.route('/api/sampah/<string:jenis>/<int:id>/pulihkan', methods=['POST'])
+@login_required
+def restore_api(jenis, id):
+    model = archive.TRASH_KINDS.get(jenis)
+    if model is None:
+        return jsonify({"error": "Jenis data tidak dikenal"}), 404
+    owner_id = None if current_user.role == 'admin' else current_user.id
+    if not archive.restore(model, id, owner_id):
+        return jsonify({"error": "Data tidak ditemukan di sampah"}), 404
+    return jsonify({"id": id, "restored": True})
+
 # todo ============== PROFILE PAGE ==============
 @views.route('/dashboard/profil', methods=['GET', 'POST'])
 @login_required
@@ -579,26 +583,24 @@ def profil():
     user = User.query.filter_by(id=current_user.id).first()
     kebun = Kebun.query.filter_by(user_id=current_user.id).all()
 
-    # Fetch regency, district, and village data based on stored IDs
-    # regency_data = get_region_by_id('regencies', user.kota)
-    # district_data = get_region_by_id('districts', user.kec)
-    # village_data = get_region_by_id('villages', user.kelurahan)
-
+    # Nama wilayah di-resolve dari dataset lokal lewat filter nama_wilayah di template
     return render_template(
         'dashboard/profil.html',
         user=user,
         kebun=kebun,
-        # regency_data=regency_data,
-        # district_data=district_data,
-        # village_data=village_data
     )
 
 @views.route('/api/proxy/<path:url>')
 def proxy(url):
     try:
-        response = requests.get(f'https://emsifa.github.io/api-wilayah-indonesia/api/{url}')
-        response.raise_for_status()
-        return jsonify(response.json())
+        body, etag = get_document(url)
+        response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = REGION_CACHE_MAX_AGE
+        return response.make_conditional(request)
+    except KeyError:
+        return jsonify({"error": "Wilayah tidak ditemukan"}), 404
     except requests.exceptions.RequestException as e:
         print(f"Error in proxy: {str(e)}")  # Log error
         return jsonify({"error": str(e)}), 500
@@ -712,8 +714,6 @@ def addkebun():
 @views.route('/dashboard/profil/import_kebun', methods=['GET', 'POST'])
 @login_required
 def importkebun():
-    from openpyxl import load_workbook
-
     if request.method == 'POST':
         excel_file = request.files['excel_file'] 
 
@@ -733,30 +733,18 @@ def importkebun():
 
             # filename = secure_filename(excel_file.filename)
             
-            try: 
-                wb = load_workbook(excel_file)
-                sheet = wb.active
-
-                for row in sheet.iter_rows(min_row=2):
-                    nama_kebun = row[0].value
-                    latitude = row[1].value
-                    longitude = row[2].value
-                    luas_kebun = row[3].value
-
-                    if Kebun.query.filter_by(nama=nama_kebun).all:
-                        flash('Kebun ini sudah ada, silakan gunakan nama lain', 'warning')
-                        return redirect(url_for('views.profil'))
-                    else:
-                        # Menyederhanakan pembuatan objek DataPangan berdasarkan tipe impor
-                        data_pangan = Kebun(nama=nama_kebun, koordinat=longitude+", "+latitude, luas_kebun=luas_kebun, user_id=current_user.id, unique_id=generate_unique_id())
-                        db.session.add(data_pangan)
-
-                db.session.commit()
-                flash('Data berhasil diimpor!', 'success')
-                return redirect(url_for('views.profil'))
+            try:
+                result = import_gardens(excel_file, current_user.id)
             except Exception as e:
                 flash(f'Terjadi kesalahan saat memproses file: {e}', 'error')
                 return redirect(request.url)
+
+            if result.error_count:
+                details = '; '.join(f'baris {row}: {message}' for row, message in result.errors[:5])
+                flash(f'{result.error_count} baris tidak diimpor. {details}', 'warning')
+            if result.inserted:
+                flash(f'{result.inserted} kebun berhasil diimpor!', 'success')
+            return redirect(url_for('views.profil'))
         else:
             flash('Ekstensi file tidak diizinkan. Unggah file Excel (.xlsx)!', 'error')
             return redirect(request.url)
@@ -828,6 +816,19 @@ def updatepassword(id):
 def weather():
     return render_template('features/weather.html')
 
+@views.route('/api/weather')
+def weather_api():
+    try:
+        body, etag = get_forecast_document(request.args.get('adm4'))
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": str(e)}), 503
+
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 5 * 60
+    return response.make_conditional(request)
+
 @views.route('/terms-and-conditions')
 def terms():
     return render_template('terms_conditions.html')
@@ -867,7 +868,7 @@ def kelfitu():
 
 @views.route('/rindangtalk', methods=['GET', 'POST'])
 def rindangtalk():
-    questions = Forum.query.filter_by(created_by=current_user.id).all()
+    questions = queries.user_questions(current_user.id).all()
     fetch_ahli_email = User.query.filter_by(role='ahli').all()
     ahli_emails = fetch_ahli_email
 
@@ -882,7 +883,7 @@ def rindangtalk():
             add_question = Forum(question=question, created_by=current_user.id)
             db.session.add(add_question)
             db.session.commit()
-            forum_email(user_email=email, question=question)
+            forum_email(user_email=email, question=question, user_id=current_user.id)
             flash('Pertanyaan anda telah terkirim', 'success')
             return redirect(request.referrer)
         except:
@@ -890,51 +891,32 @@ def rindangtalk():
             return redirect(request.referrer)
     return render_template('features/rindangtalk.html', questions=questions)
 
-@views.route('/avatar/<string:name>', methods=['GET', 'POST'])
+@views.route('/avatar/<string:name>', methods=['GET'])
 def get_avatar(name):
-    # Encoding untuk menghindari masalah karakter khusus
-    encoded_name = name.encode('utf-8').decode('ascii', 'ignore')
-    # Membangun URL avatar dengan aman
-    avatar_url = f"https://ui-avatars.com/api/?name={encoded_name}&background=random&length=1&bold=true&rounded=true"
-    return redirect(avatar_url) # Redirect ke URL avatar
-
-def forum_email(user_email, question):
-    try:
-        subject = "Pertanyaan Terkirim ke RindangTalk"
-        msg = Message(subject=subject, sender=('official@rindang.net'), recipients=[user_email], body=f'Anda mengirim pertanyaan ke ahli dengan dengan detail sebagai berikut: {question}')
-        
-        with mail.connect() as conn:
-            conn.send(msg)
-        current_app.logger.info(f"Email sent successfully to {user_email}")
-    except smtplib.SMTPAuthenticationError:
-        current_app.logger.error("SMTP Authentication Error. Please check your username and password.")
-        raise
-    except smtplib.SMTPException as e:
-        current_app.logger.error(f"SMTP error occurred: {str(e)}")
-        raise
-    except Exception as e:
-        current_app.logger.error(f"Failed to send email: {str(e)}")
-        current_app.logger.exception("Email sending error")
-        raise
-
-def forum_email_to_ahli(user_email, user_name, question):
-    try:
-        subject = "Anda "
-        msg = Message(subject=subject, sender=('official@rindang.net'), recipients=[user_email], body=f'Anda mendapatkan pertanyaan dari seorang pengguna dengan nama {user_name}, yaitu: {question}')
-        
-        with mail.connect() as conn:
-            conn.send(msg)
-        current_app.logger.info(f"Email sent successfully to {user_email}")
-    except smtplib.SMTPAuthenticationError:
-        current_app.logger.error("SMTP Authentication Error. Please check your username and password.")
-        raise
-    except smtplib.SMTPException as e:
-        current_app.logger.error(f"SMTP error occurred: {str(e)}")
-        raise
-    except Exception as e:
-        current_app.logger.error(f"Failed to send email: {str(e)}")
-        current_app.logger.exception("Email sending error")
-        raise
+    # Avatar inisial dibuat sendiri; hanya avatar pengguna yang tersimpan boleh di-cache selamanya
+    size = normalize_size(request.args.get('size', type=int))
+    file, is_user = avatar_file(name, size)
+    response = send_file(file, mimetype='image/png', max_age=AVATAR_MAX_AGE if is_user else GUEST_AVATAR_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = is_user
+    return response
+
+def forum_email(user_email, question, user_id=None):
+    # Dikirim oleh worker job agar request tidak menunggu SMTP; gagal kirim diulang otomatis
+    return jobs.enqueue('email', {
+        'subject': "Pertanyaan Terkirim ke RindangTalk",
+        'sender': 'official@rindang.net',
+        'recipients': [user_email],
+        'body': f'Anda mengirim pertanyaan ke ahli dengan dengan detail sebagai berikut: {question}',
+    }, user_id=user_id)
+
+def forum_email_to_ahli(user_email, user_name, question, user_id=None):
+    return jobs.enqueue('email', {
+        'subject': "Anda ",
+        'sender': 'official@rindang.net',
+        'recipients': [user_email],
+        'body': f'Anda mendapatkan pertanyaan dari seorang pengguna dengan nama {user_name}, yaitu: {question}',
+    }, user_id=user_id)
 
 @views.route('/rindangtalk/update_question/<int:id>', methods=['GET', 'POST'])
 @login_required
@@ -946,14 +928,16 @@ def update_question(id):
 @login_required
 def delete_question(id):
     question = Forum.query.get_or_404(id)
-    db.session.delete(question)
+    question.is_deleted = True
     db.session.commit()
     flash('Berhasil menghapus pertanyaan!', 'warning')
     return redirect(url_for('views.personal'))
 
 @views.route('/rindangpedia')
+@read_replica
 def rindangpedia():
-    articles = Artikel.query.all()
+    # Daftar hanya butuh ringkasan; isi artikel lengkap dimuat di read_article
+    articles = queries.article_list().all()
     return render_template('features/rindangpedia.html', articles=articles, shorten=shorten)
 
 class MyHomeView(AdminIndexView):
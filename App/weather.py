@@ -0,0 +1,260 @@
+import hashlib, json, math, os, threading, click
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+
+from App import db
+from App.cache import TTLCache, spawn
+from App.gateway import gateway
+from App.models import PrakiraanCuaca, CuacaKebun, Kebun
+from App.utils import parse_koordinat
+
+BMKG_URL = 'https://api.bmkg.go.id/publik/prakiraan-cuaca'
+BMKG_ADM2 = os.environ.get('BMKG_ADM2', '82.71')  # Kota Ternate
+BMKG_ADM4 = os.environ.get('BMKG_ADM4')  # Kelurahan default; kosong berarti kelurahan pertama
+BMKG_REFRESH_INTERVAL = int(os.environ.get('BMKG_REFRESH_INTERVAL', 30 * 60))
+
+# Field BMKG yang benar-benar dipakai oleh halaman cuaca dan dashboard
+FORECAST_FIELDS = ('local_datetime', 't', 'hu', 'ws', 'wd', 'tcc', 'tp', 'weather', 'weather_desc', 'image', 'vs_text')
+
+OPENMETEO_URL = 'https://api.open-meteo.com/v1/forecast'
+OPENMETEO_DAILY = ('weather_code', 'temperature_2m_max', 'temperature_2m_min', 'precipitation_sum')
+OPENMETEO_REFRESH_INTERVAL = int(os.environ.get('OPENMETEO_REFRESH_INTERVAL', 3 * 3600))
+OPENMETEO_BATCH_SIZE = int(os.environ.get('OPENMETEO_BATCH_SIZE', 100))
+# Kebun dalam satu sel grid (~5 km) berbagi satu titik prakiraan
+GRID_STEP = float(os.environ.get('OPENMETEO_GRID_STEP', 0.05))
+
+weather_cache = TTLCache(ttl=5 * 60, stale_ttl=BMKG_REFRESH_INTERVAL, maxsize=128, name='cuaca')
+
+cuaca_cli = AppGroup('cuaca', help='Kelola data prakiraan cuaca.')
+_forecast_refresh_lock = threading.Lock()
+
+def _compact(cuaca):
+    return [
+        [{field: item.get(field) for field in FORECAST_FIELDS} for item in day]
+        for day in cuaca
+    ]
+
+def _store_forecast(payload):
+    existing = {row.adm4: row for row in PrakiraanCuaca.query.all()}
+    now = datetime.now()
+    for area in payload.get('data', []):
+        lokasi = area.get('lokasi', {})
+        adm4 = lokasi.get('adm4')
+        if not adm4:
+            continue
+        row = existing.get(adm4) or PrakiraanCuaca(adm4=adm4)
+        row.desa = lokasi.get('desa')
+        row.kecamatan = lokasi.get('kecamatan')
+        row.cuaca = _compact(area.get('cuaca', []))
+        row.analysis_date = (area.get('cuaca') or [[{}]])[0][0].get('analysis_date')
+        row.fetched_at = now
+        db.session.add(row)
+    db.session.commit()
+
+def refresh_forecast(adm2=BMKG_ADM2):
+    """Fetches the BMKG forecast for every village in adm2 and stores a compact copy.
+
+    Returns:
+        int: Number of areas stored.
+    """
+    response = gateway.get(BMKG_URL, params={'adm2': adm2})
+    response.raise_for_status()
+    payload = response.json()
+
+    try:
+        _store_forecast(payload)
+    except IntegrityError:
+        # Proses lain (mis. flask cuaca refresh) lebih dulu menyisipkan adm4 yang sama;
+        # baca ulang barisnya lalu simpan sebagai update
+        db.session.rollback()
+        _store_forecast(payload)
+    weather_cache.clear()
+    return len(payload.get('data', []))
+
+def _refresh_forecast_once():
+    try:
+        refresh_forecast()
+    finally:
+        _forecast_refresh_lock.release()
+
+def _newest_forecast():
+    return db.session.query(db.func.max(PrakiraanCuaca.fetched_at)).scalar()
+
+def _build_document(adm4):
+    newest = _newest_forecast()
+    if newest is None:
+        # Belum ada data sama sekali: satu request mengambil dari BMKG, yang lain menunggu
+        with _forecast_refresh_lock:
+            db.session.rollback()  # akhiri snapshot transaksi agar hasil request lain terlihat
+            if _newest_forecast() is None:
+                try:
+                    refresh_forecast()
+                except Exception:
+                    db.session.rollback()
+                    raise
+    elif datetime.now() - newest > timedelta(seconds=BMKG_REFRESH_INTERVAL):
+        # Data lama tetap dilayani; satu pembaruan berjalan di latar belakang untuk semua adm4
+        if _forecast_refresh_lock.acquire(blocking=False):
+            spawn(_refresh_forecast_once)
+
+    query = PrakiraanCuaca.query.order_by(PrakiraanCuaca.adm4)
+    if adm4 is None:
+        adm4 = BMKG_ADM4
+        rows = query.filter_by(adm4=adm4).all() if adm4 else query.limit(1).all()
+    elif adm4 == '*':
+        rows = query.all()
+    else:
+        rows = query.filter_by(adm4=adm4).all()
+
+    document = {
+        'updated_at': max(row.fetched_at for row in rows).isoformat() if rows else None,
+        'data': [
+            {
+                'lokasi': {'adm4': row.adm4, 'desa': row.desa, 'kecamatan': row.kecamatan},
+                'cuaca': row.cuaca,
+            }
+            for row in rows
+        ],
+    }
+    body = json.dumps(document, separators=(',', ':')).encode('utf-8')
+    return body, hashlib.sha1(body).hexdigest()
+
+def get_forecast_document(adm4=None):
+    """Returns (body, etag) of the compact forecast.
+
+    Args:
+        adm4 (str): Village code; None means the default village and "*" means
+            every village in BMKG_ADM2.
+
+    BMKG is only called in the request when nothing is stored yet. A stale
+    forecast is served as it is while one background refresh, shared by
+    every village, fetches a new one; `flask cuaca refresh` can also run
+    from cron to keep requests off the refresh entirely.
+
+    Raises:
+        requests.exceptions.RequestException: If BMKG fails and nothing is stored yet.
+    """
+    return weather_cache.get_or_load(('bmkg', adm4), lambda: _build_document(adm4))
+
+@cuaca_cli.command('refresh')
+def refresh_command():
+    """Ambil ulang prakiraan BMKG untuk wilayah yang dipantau."""
+    click.echo(f"{refresh_forecast()} wilayah diperbarui dari BMKG.")
+
+_openmeteo_client = None
+_garden_refresh_lock = threading.Lock()
+
+def _get_openmeteo_client():
+    """Builds the Open-Meteo client once, backed by a persistent requests-cache store."""
+    global _openmeteo_client
+    if _openmeteo_client is None:
+        import openmeteo_requests, requests_cache
+        from retry_requests import retry
+
+        os.makedirs(current_app.instance_path, exist_ok=True)
+        session = requests_cache.CachedSession(
+            os.path.join(current_app.instance_path, 'openmeteo_cache'),
+            expire_after=OPENMETEO_REFRESH_INTERVAL,
+        )
+        _openmeteo_client = openmeteo_requests.Client(session=retry(session, retries=3, backoff_factor=0.2))
+    return _openmeteo_client
+
+def snap_to_grid(latitude, longitude, step=GRID_STEP):
+    return round(round(latitude / step) * step, 4), round(round(longitude / step) * step, 4)
+
+def _number(value, digits=1):
+    # Open-Meteo mengirim NaN untuk nilai yang tidak tersedia; NaN tidak valid di kolom JSON
+    return None if value is None or math.isnan(value) else round(value, digits)
+
+def _daily_forecast(response):
+    daily = response.Daily()
+    values = [daily.Variables(i).ValuesAsNumpy().tolist() for i in range(len(OPENMETEO_DAILY))]
+    days = []
+    for i, timestamp in enumerate(range(daily.Time(), daily.TimeEnd(), daily.Interval())):
+        # Time() dalam UTC, ditambah offset zona waktu agar tanggalnya tanggal lokal
+        tanggal = date.fromtimestamp(timestamp + response.UtcOffsetSeconds())
+        weather_code, suhu_max, suhu_min, hujan = (column[i] for column in values)
+        days.append({
+            'tanggal': tanggal.isoformat(),
+            'weather_code': _number(weather_code, None),
+            'suhu_max': _number(suhu_max),
+            'suhu_min': _number(suhu_min),
+            'hujan_mm': _number(hujan),
+        })
+    return days
+
+def refresh_garden_weather():
+    """Fetches a daily forecast for every garden with valid coordinates.
+
+    Gardens are grouped by grid cell so nearby gardens share one point, and
+    the cells are sent to Open-Meteo as multi-location requests of
+    OPENMETEO_BATCH_SIZE points each.
+
+    Returns:
+        int: Number of gardens updated.
+    """
+    cells = defaultdict(list)
+    for kebun_id, koordinat in db.session.query(Kebun.id, Kebun.koordinat).filter(Kebun.is_deleted == False):
+        parsed = parse_koordinat(koordinat)
+        if parsed:
+            cells[snap_to_grid(*parsed)].append(kebun_id)
+
+    client = _get_openmeteo_client()
+    existing = {row.kebun_id: row for row in CuacaKebun.query.all()}
+    now = datetime.now()
+    points = list(cells)
+    updated = 0
+    for start in range(0, len(points), OPENMETEO_BATCH_SIZE):
+        batch = points[start:start + OPENMETEO_BATCH_SIZE]
+        params = {
+            'latitude': [lat for lat, _ in batch],
+            'longitude': [lon for _, lon in batch],
+            'daily': list(OPENMETEO_DAILY),
+            'timezone': 'Asia/Jayapura',
+            'forecast_days': 3,
+        }
+        responses = gateway.call('api.open-meteo.com', client.weather_api, OPENMETEO_URL, params=params)
+        for (latitude, longitude), response in zip(batch, responses):
+            harian = _daily_forecast(response)
+            for kebun_id in cells[(latitude, longitude)]:
+                row = existing.get(kebun_id) or CuacaKebun(kebun_id=kebun_id)
+                row.latitude, row.longitude = latitude, longitude
+                row.harian = harian
+                row.fetched_at = now
+                db.session.add(row)
+                updated += 1
+        db.session.commit()
+    return updated
+
+def _refresh_garden_weather_once():
+    try:
+        refresh_garden_weather()
+    finally:
+        _garden_refresh_lock.release()
+
+def garden_forecasts(kebun_list):
+    """Returns the stored forecast of each garden, keyed by garden ID.
+
+    Never calls Open-Meteo in the request: if a garden with valid coordinates
+    has no forecast or a stale one, a single background refresh of all
+    gardens is started and the current rows are returned as they are.
+    Deleted gardens are ignored, as in refresh_garden_weather.
+    """
+    located = [kebun.id for kebun in kebun_list if not kebun.is_deleted and parse_koordinat(kebun.koordinat)]
+    if not located:
+        return {}
+    rows = CuacaKebun.query.filter(CuacaKebun.kebun_id.in_(located)).all()
+    threshold = datetime.now() - timedelta(seconds=OPENMETEO_REFRESH_INTERVAL)
+    stale = len(rows) < len(located) or any(row.fetched_at < threshold for row in rows)
+    if stale and _garden_refresh_lock.acquire(blocking=False):
+        spawn(_refresh_garden_weather_once)
+    return {row.kebun_id: row.harian for row in rows}
+
+@cuaca_cli.command('kebun')
+def garden_command():
+    """Ambil prakiraan Open-Meteo untuk semua kebun dalam batch per sel grid."""
+    click.echo(f"{refresh_garden_weather()} kebun diperbarui dari Open-Meteo.")
@@ -0,0 +1,50 @@
+"""adding indexes for hot query paths
+
+Revision ID: c5d2a7f1b3e9
+Revises: 9e46ed1edb0b
+Create Date: 2026-10-18 16:20:41.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2a7f1b3e9'
+down_revision = '9e46ed1edb0b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('data_pangan', schema=None) as batch_op:
+        batch_op.create_index('ix_data_pangan_user_komoditas_bibit', ['user_id', 'komoditas', 'tanggal_bibit'], unique=False)
+        batch_op.create_index('ix_data_pangan_user_komoditas_panen', ['user_id', 'komoditas', 'tanggal_panen'], unique=False)
+        batch_op.create_index('ix_data_pangan_kebun_komoditas_panen', ['kebun_id', 'komoditas', 'tanggal_panen'], unique=False)
+
+    with op.batch_alter_table('forum', schema=None) as batch_op:
+        batch_op.create_index('ix_forum_created_by', ['created_by', 'created_at'], unique=False)
+
+    with op.batch_alter_table('artikel', schema=None) as batch_op:
+        batch_op.create_index('ix_artikel_status', ['is_approved', 'is_drafted', 'created_at'], unique=False)
+        batch_op.create_index('ix_artikel_created_by', ['created_by', 'created_at'], unique=False)
+
+    with op.batch_alter_table('kebun', schema=None) as batch_op:
+        batch_op.create_index('ix_kebun_nama', ['nama'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('kebun', schema=None) as batch_op:
+        batch_op.drop_index('ix_kebun_nama')
+
+    with op.batch_alter_table('artikel', schema=None) as batch_op:
+        batch_op.drop_index('ix_artikel_created_by')
+        batch_op.drop_index('ix_artikel_status')
+
+    with op.batch_alter_table('forum', schema=None) as batch_op:
+        batch_op.drop_index('ix_forum_created_by')
+
+    with op.batch_alter_table('data_pangan', schema=None) as batch_op:
+        batch_op.drop_index('ix_data_pangan_kebun_komoditas_panen')
+        batch_op.drop_index('ix_data_pangan_user_komoditas_panen')
+        batch_op.drop_index('ix_data_pangan_user_komoditas_bibit')
@@ -0,0 +1,65 @@
+"""adding ringkasan and waktu_baca to Artikel
+
+Revision ID: e1b4c8d2a6f0
+Revises: c5d2a7f1b3e9
+Create Date: 2026-10-18 17:05:12.334190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import math
+from bs4 import BeautifulSoup
+from textwrap import shorten
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b4c8d2a6f0'
+down_revision = 'c5d2a7f1b3e9'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 200
+
+# Salinan beku App.articles.summarize saat migrasi ini dibuat; jangan impor kode aplikasi
+# agar migrasi tetap bisa diputar ulang dengan hasil yang sama
+EXCERPT_LENGTH = 280
+WORDS_PER_MINUTE = 200
+
+
+def summarize(html):
+    text = ' '.join(BeautifulSoup(html, 'html.parser').get_text(' ').split()) if html else ''
+    minutes = max(1, math.ceil(len(text.split()) / WORDS_PER_MINUTE))
+    return shorten(text, width=EXCERPT_LENGTH, placeholder='…'), minutes
+
+
+def upgrade():
+    with op.batch_alter_table('artikel', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ringkasan', sa.String(length=300), nullable=True))
+        batch_op.add_column(sa.Column('waktu_baca', sa.Integer(), nullable=True))
+
+    # Isi ringkasan artikel lama per batch agar tidak memuat semua konten sekaligus
+    artikel = sa.table('artikel', sa.column('id', sa.Integer), sa.column('content', sa.Text),
+                       sa.column('ringkasan', sa.String), sa.column('waktu_baca', sa.Integer))
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(artikel.c.id, artikel.c.content)
+            .where(artikel.c.id > last_id)
+            .order_by(artikel.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for id, content in rows:
+            ringkasan, waktu_baca = summarize(content)
+            conn.execute(artikel.update().where(artikel.c.id == id)
+                         .values(ringkasan=ringkasan, waktu_baca=waktu_baca))
+        last_id = rows[-1].id
+
+
+def downgrade():
+    with op.batch_alter_table('artikel', schema=None) as batch_op:
+        batch_op.drop_column('waktu_baca')
+        batch_op.drop_column('ringkasan')
@@ -0,0 +1,20 @@
+import os
+import pytest
+
+# App membuat aplikasi saat diimpor dan membaca konfigurasi dari environment
+os.environ.setdefault('GEMINI_API_KEY', 'test')
+
+MYSQL_ENV = ('MYSQLUSER', 'MYSQLPASSWORD', 'MYSQLHOST', 'MYSQLDATABASE')
+
+@pytest.fixture(scope='session')
+def app():
+    """The application bound to the MySQL database given by the MYSQL* env vars."""
+    if not all(os.environ.get(name) for name in MYSQL_ENV):
+        pytest.skip('MYSQLUSER, MYSQLPASSWORD, MYSQLHOST dan MYSQLDATABASE belum diatur')
+    from App import app
+    return app
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield app
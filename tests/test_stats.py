@@ -0,0 +1,46 @@
+from datetime import date
+
+ROWS = [
+    # id, komoditas, tanggal_bibit, tanggal_panen, estimasi_panen, jml_panen
+    (1, 'Cabai', date(2024, 1, 1), date(2024, 5, 1), date(2024, 4, 30), 1000),
+    (2, 'Cabai', date(2024, 2, 1), date(2024, 6, 1), date(2024, 5, 31), 1500),
+    # Dua panen terpisah dengan tanggal yang sama harus tetap dua titik
+    (3, 'Cabai', date(2024, 2, 1), date(2024, 6, 1), date(2024, 5, 31), 500),
+    (4, 'Tomat', date(2024, 3, 1), None, date(2024, 6, 29), 0),
+    (5, 'Tomat', date(2024, 3, 1), None, date(2024, 6, 29), 0),
+    (6, 'Tomat', date(2024, 1, 15), date(2024, 5, 10), date(2024, 5, 14), 800),
+]
+
+def _baseline(rows, nama):
+    """Series as views.dataproduksi built them before the stats service.
+
+    One point per row ordered by tanggal_bibit descending; ties follow the
+    backward index read (newest id first).
+    """
+    data = sorted((row for row in rows if row[1] == nama), key=lambda row: (row[2], row[0]), reverse=True)
+    stat = [row[5] for row in data]
+    tgl_panen = [row[3].isoformat() if row[3] else None for row in data]
+    return stat, tgl_panen
+
+def _calc_increase(data):
+    # Salinan calc_increase dari views.dataproduksi sebelum layanan statistik
+    if len(data) < 2 or 0 in data:
+        return 0
+    return round(((data[-1] - data[-2]) / data[-2]) * 100)
+
+def test_farmer_stats_match_baseline_per_row_series(app):
+    from App.stats import summarize_farmer_rows, commodity_stats, increase
+
+    ordered = sorted(ROWS, key=lambda row: (row[1], row[2], row[0]))
+    stats = summarize_farmer_rows([(id, nama, panen, estimasi, jml) for id, nama, _, panen, estimasi, jml in ordered])
+
+    assert stats['jumlah_data'] == len(ROWS)
+    assert stats['total_panen'] == sum(row[5] for row in ROWS)
+    assert stats['estimasi_panen'] == sorted({row[4] for row in ROWS})
+    for nama in ('Cabai', 'Tomat'):
+        stat, tgl_panen = _baseline(ROWS, nama)
+        item = commodity_stats(stats, nama)
+        assert item['jml_panen'] == stat
+        assert item['tgl_panen'] == tgl_panen
+        assert item['total_panen'] == sum(stat)
+        assert increase(item['jml_panen']) == _calc_increase(stat)